@@ -1,60 +1,54 @@
 # api/app.py
 
 import os
-import json
-import base64
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
-from datetime import datetime, timedelta
-import io
+import gzip
+from flask import Flask, abort, render_template, request, redirect, url_for, flash, send_file, jsonify, Response, stream_with_context
+from datetime import datetime
 from dotenv import load_dotenv
+import time
 import warnings
 from urllib3.exceptions import NotOpenSSLWarning
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib.units import mm
 import logging
 
-# Importations pour Firestore
-from google.cloud import firestore
-from google.oauth2 import service_account
-import firebase_admin
-from firebase_admin import credentials
-
 # Ignorer les avertissements NotOpenSSLWarning (facultatif)
 warnings.simplefilter('ignore', NotOpenSSLWarning)
 
 # Charger les variables d'environnement depuis .env
-load_dotenv()
+load_dotenv()  # Avant les modules api.*, qui lisent leur configuration à l'import
+
+from api.batching import BatchWriter
+from api.candidate_import import CandidateImportError, candidate_key, import_candidates, iter_candidate_rows
+from api.candidate_search import search_candidates, with_search_tokens
+from api.bulk_export import BulkExportError, find_sessions, iter_zip
+from api.cascade import delete_candidate_cascade, delete_existing_session
+from api.counters import SessionNumberAllocator
+from api.export_jobs import DONE as EXPORT_DONE, EXPORT_JOBS_ENABLED, ExportQueueFull, export_jobs
+from api.metrics import current_request, end_request, registry, server_timing, start_request
+from api.parallel_reads import gather
+from api.pagination import fetch_sessions_page, page_filters
+from api.pdf_cache import attendance_pdf_key, invalidate_session as invalidate_pdf_cache, is_valid_pdf_key, is_valid_session_id, pdf_store
+from api.session_cache import session_cache
+from api.session_summary import add_candidates, candidat_entry, load_entries, periode_entry, summary_fields
+from api.signatures import SIGNATURE_HEIGHT, SIGNATURE_WIDTH, SLOTS, SignatureError, load_signatures, read_sync_payload, save_signatures, signatures_digest, signed_slots
+from api.storage import LazyDatabase, server_timestamp, start_warmup
+from api.work_calendar import periode_bounds, periode_days, periode_fields, working_days
 
 # Configurations Flask
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')  # Pas de valeur par défaut
+# Taille maximale d'une requête (fichiers importés compris), 16 Mo par défaut
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))
 
 # Vérifier que la clé secrète est définie
 if not app.config['SECRET_KEY']:
     raise ValueError("La variable d'environnement SECRET_KEY n'est pas définie.")
 
-# Initialiser Firebase avec la clé décryptée
-firebase_service_account_b64 = os.getenv('FIREBASE_SERVICE_ACCOUNT')
-if not firebase_service_account_b64:
-    raise ValueError("La variable d'environnement FIREBASE_SERVICE_ACCOUNT n'est pas définie.")
-
-try:
-    service_account_info = json.loads(base64.b64decode(firebase_service_account_b64))
-except Exception as e:
-    raise ValueError(f"Erreur lors du décodage de FIREBASE_SERVICE_ACCOUNT : {e}")
-
-# Initialiser Firebase Admin SDK
-cred = credentials.Certificate(service_account_info)
-firebase_admin.initialize_app(cred)
-
-# Créer les credentials pour google.cloud.firestore
-credentials = service_account.Credentials.from_service_account_info(service_account_info)
+# Base de données (Firestore ou SQLite selon STORAGE_BACKEND), initialisée à la première utilisation
+db = LazyDatabase()
+start_warmup()
 
-# Initialiser Firestore avec les credentials appropriés
-db = firestore.Client(credentials=credentials)
+# Numérotation atomique des sessions via le document counters/sessions
+session_numbers = SessionNumberAllocator(db)
 
 # Définir les options pour les sites et les formations
 SITE_OPTIONS = [
@@ -72,8 +66,32 @@ FORMATION_OPTIONS = [
     "Conducteur d'engins de Chantier"
 ]
 
-# Configurer le logging
-logging.basicConfig(level=logging.DEBUG)
+# Configurer le logging (DEBUG seulement à la demande : LOG_LEVEL=DEBUG)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+
+@app.before_request
+def start_request_metrics():
+    start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    # Pour les réponses envoyées en flux (export ZIP), la durée s'arrête au
+    # premier octet : la suite est produite après cette fonction
+    metrics = current_request()
+    if metrics is not None:
+        seconds = time.perf_counter() - metrics.start
+        registry.observe_request(request.endpoint or 'inconnue', request.method, response.status_code, seconds, metrics)
+        response.headers['Server-Timing'] = server_timing(metrics)
+    return response
+
+@app.teardown_request
+def end_request_metrics(exc):
+    end_request()
+
+def invalidate_session_caches(session_id):
+    # À appeler après toute modification d'une session, de ses candidats ou de ses périodes
+    session_cache.invalidate(session_id)
+    invalidate_pdf_cache(session_id)
 
 # Routes
 @app.route('/')
@@ -92,39 +110,8 @@ def create_session():
             logging.warning("Option de site ou de formation invalide.")
             return redirect(url_for('create_session'))
 
-        # Obtenir le nombre actuel de sessions
-        sessions_ref = db.collection('sessions')
-        sessions_count = len(list(sessions_ref.stream()))
-        session_number = sessions_count + 1
-
-        # Créer une nouvelle session avec le numéro séquentiel
-        session_ref = db.collection('sessions').document()
-        session_data = {
-            'session_number': session_number,
-            'site': site,
-            'formation': formation,
-            'annule': False,
-            'created_at': firestore.SERVER_TIMESTAMP
-        }
-        session_ref.set(session_data)
-        logging.debug(f"Session créée avec l'ID {session_ref.id} et le numéro {session_number}.")
-        session_id = session_ref.id
-
-        # Ajouter les candidats
-        noms = request.form.getlist('nom')
-        prenoms = request.form.getlist('prenom')
-        for nom, prenom in zip(noms, prenoms):
-            if nom.strip() and prenom.strip():
-                candidat_data = {
-                    'nom': nom.strip(),
-                    'prenom': prenom.strip(),
-                    'session_id': session_id,
-                    'created_at': firestore.SERVER_TIMESTAMP
-                }
-                db.collection('candidats').add(candidat_data)
-                logging.debug(f"Candidat ajouté : {prenom} {nom}.")
-
-        # Ajouter les périodes
+        # Valider toutes les périodes avant d'écrire quoi que ce soit
+        periodes = []
         dates_debut = request.form.getlist('date_debut')
         dates_fin = request.form.getlist('date_fin')
         for date_debut, date_fin in zip(dates_debut, dates_fin):
@@ -132,26 +119,63 @@ def create_session():
                 try:
                     date_debut_dt = datetime.strptime(date_debut, '%Y-%m-%d').date()
                     date_fin_dt = datetime.strptime(date_fin, '%Y-%m-%d').date()
-                    if date_debut_dt <= date_fin_dt:
-                        nb_jours = (date_fin_dt - date_debut_dt).days + 1
-                        heures = nb_jours * 7
-                        periode_data = {
-                            'date_debut': date_debut_dt.strftime('%d/%m/%Y'),
-                            'date_fin': date_fin_dt.strftime('%d/%m/%Y'),
-                            'heures': heures,
-                            'session_id': session_id,
-                            'created_at': firestore.SERVER_TIMESTAMP
-                        }
-                        db.collection('periodes').add(periode_data)
-                        logging.debug(f"Période ajoutée : {date_debut} au {date_fin}, Heures : {heures}.")
-                    else:
-                        flash("Erreur : La date de début doit être antérieure ou égale à la date de fin.", "danger")
-                        logging.warning("Date de début postérieure à la date de fin.")
-                        return redirect(url_for('create_session'))
                 except ValueError:
                     flash("Format de date invalide. Veuillez utiliser le format AAAA-MM-JJ.", "danger")
                     logging.warning("Format de date invalide.")
                     return redirect(url_for('create_session'))
+                if date_debut_dt > date_fin_dt:
+                    flash("Erreur : La date de début doit être antérieure ou égale à la date de fin.", "danger")
+                    logging.warning("Date de début postérieure à la date de fin.")
+                    return redirect(url_for('create_session'))
+                if not working_days(date_debut_dt, date_fin_dt):
+                    flash(f"Erreur : La période du {date_debut_dt.strftime('%d/%m/%Y')} au "
+                          f"{date_fin_dt.strftime('%d/%m/%Y')} ne comporte aucun jour ouvré.", "danger")
+                    return redirect(url_for('create_session'))
+                periodes.append((date_debut_dt, date_fin_dt))
+
+        # Réserver atomiquement le prochain numéro de session
+        session_number = session_numbers.next_number()
+
+        # Écrire la session, ses candidats et ses périodes en un seul lot ; la
+        # session est écrite en dernier, avec son résumé dénormalisé
+        with BatchWriter(db) as batch:
+            session_ref = db.collection('sessions').document()
+            session_id = session_ref.id
+
+            # Ajouter les candidats
+            candidats = []
+            noms = request.form.getlist('nom')
+            prenoms = request.form.getlist('prenom')
+            for nom, prenom in zip(noms, prenoms):
+                if nom.strip() and prenom.strip():
+                    data = {
+                        'nom': nom.strip(),
+                        'prenom': prenom.strip(),
+                        'session_id': session_id,
+                        'created_at': server_timestamp()
+                    }
+                    candidats.append(candidat_entry(batch.add('candidats', with_search_tokens(data)).id, data))
+
+            # Ajouter les périodes
+            periodes_entries = []
+            for date_debut_dt, date_fin_dt in periodes:
+                # Dates natives, jours ouvrés et heures (7 par jour ouvré) calculés une fois ici
+                data = {
+                    **periode_fields(date_debut_dt, date_fin_dt),
+                    'session_id': session_id,
+                    'created_at': server_timestamp()
+                }
+                periodes_entries.append(periode_entry(batch.add('periodes', data).id, data))
+
+            batch.set(session_ref, {
+                'session_number': session_number,
+                'site': site,
+                'formation': formation,
+                'annule': False,
+                'created_at': server_timestamp(),
+                **summary_fields(candidats, periodes_entries)
+            })
+        logging.debug("Session %s (n° %s) créée : %d écriture(s).", session_id, session_number, batch.committed)
 
         flash(f"Session créée avec succès. Numéro de session : {session_number}", "success")
         return redirect(url_for('success', session_number=session_number))
@@ -165,31 +189,13 @@ def success():
 
 @app.route('/session/<string:session_id>', methods=['GET'])
 def session_details(session_id):
-    session_ref = db.collection('sessions').document(session_id)
-    session = session_ref.get()
-    if not session.exists:
+    aggregate = session_cache.get(db, session_id)
+    if aggregate is None:
         flash("Session non trouvée.", "danger")
         return redirect(url_for('list_sessions'))
-    session_data = session.to_dict()
-    session_data['id'] = session.id
-
-    # Récupérer les candidats
-    candidats_ref = db.collection('candidats').where('session_id', '==', session_id)
-    candidats = []
-    for doc in candidats_ref.stream():
-        candidat = doc.to_dict()
-        candidat['id'] = doc.id
-        candidats.append(candidat)
-
-    # Récupérer les périodes
-    periodes_ref = db.collection('periodes').where('session_id', '==', session_id)
-    periodes = []
-    for doc in periodes_ref.stream():
-        periode = doc.to_dict()
-        periode['id'] = doc.id
-        periodes.append(periode)
-
-    return render_template('session_details.html', session=session_data, candidates=candidats, periodes=periodes)
+
+    return render_template('session_details.html', session=aggregate['session'],
+                           candidates=aggregate['candidats'], periodes=aggregate['periodes'])
 
 @app.route('/delete_candidate/<string:candidate_id>', methods=['POST'])
 def delete_candidate(candidate_id):
@@ -200,40 +206,42 @@ def delete_candidate(candidate_id):
         return redirect(url_for('list_sessions'))
     
     session_id = candidate.to_dict()['session_id']
-    candidate_ref.delete()
+    delete_candidate_cascade(db, session_id, candidate_id)
+    invalidate_session_caches(session_id)
     flash("Candidat supprimé avec succès.", "success")
     return redirect(url_for('session_details', session_id=session_id))
 
 @app.route('/sessions')
 def list_sessions():
-    sessions = []
-    sessions_ref = db.collection('sessions').order_by('created_at', direction=firestore.Query.DESCENDING)
-    for doc in sessions_ref.stream():
-        session = doc.to_dict()
-        session['id'] = doc.id
-        sessions.append(session)
-    return render_template('sessions.html', sessions=sessions)
+    filters = page_filters(request.args)
+    sessions, next_cursor = fetch_sessions_page(db, order_by='created_at', descending=True, **filters)
+    return render_template('sessions.html', sessions=sessions, next_cursor=next_cursor, filters=filters,
+                           site_options=SITE_OPTIONS, formation_options=FORMATION_OPTIONS)
+
+@app.route('/get_sessions')
+def get_sessions():
+    filters = page_filters(request.args)
+    sessions, next_cursor = fetch_sessions_page(db, order_by='created_at', descending=True, **filters)
+    return jsonify({"sessions": sessions, "next": next_cursor})
+
+@app.route('/search')
+def search():
+    return render_template('search.html', query=request.args.get('q', ''))
+
+@app.route('/search_candidates')
+def search_candidates_json():
+    # Recherche par nom ou prénom, insensible à la casse et aux accents, sur
+    # les candidats de toutes les sessions
+    return jsonify({"results": search_candidates(db, request.args.get('q', ''))})
 
 @app.route('/delete_session/<string:session_id>', methods=['POST'])
 def delete_session(session_id):
-    session_ref = db.collection('sessions').document(session_id)
-    session = session_ref.get()
-    if not session.exists:
+    # Supprimer les candidats, périodes et signatures liés, puis la session ;
+    # la session et ses documents liés sont lus en même temps
+    if delete_existing_session(db, session_id) is None:
         flash("Session non trouvée.", "danger")
         return redirect(url_for('list_sessions'))
-    
-    # Supprimer tous les candidats liés
-    candidats_ref = db.collection('candidats').where('session_id', '==', session_id)
-    for doc in candidats_ref.stream():
-        doc.reference.delete()
-    
-    # Supprimer toutes les périodes liées
-    periodes_ref = db.collection('periodes').where('session_id', '==', session_id)
-    for doc in periodes_ref.stream():
-        doc.reference.delete()
-    
-    # Supprimer la session
-    session_ref.delete()
+    invalidate_session_caches(session_id)
     flash("Session supprimée avec succès.", "success")
     return redirect(url_for('list_sessions'))
 
@@ -250,184 +258,231 @@ def cancel_session(session_id):
         flash("La session est déjà annulée.", "info")
     else:
         session_ref.update({'annule': True})
+        invalidate_session_caches(session_id)
         flash("La session a été annulée avec succès.", "success")
     
     return redirect(url_for('list_sessions'))
 
+def attendance_selection(form):
+    # Session, périodes et candidats choisis dans le formulaire d'émargement,
+    # et signatures numériques si la case "signatures" est cochée (None sinon) ;
+    # renvoie ((session_id, session, périodes, candidats, signatures), None) ou
+    # (None, message d'erreur). La session et ses signatures sont lues en même temps.
+    session_id = form.get('session_id')
+    periode_id = form.get('periode_id')
+    candidate_id = form.get('candidate_id')
+    all_candidates = form.get('all_candidates')
+    all_periodes = form.get('all_periodes')
+
+    if not session_id:
+        return None, "Session invalide."
+    if form.get('signatures'):
+        aggregate, signatures = gather(lambda: session_cache.get(db, session_id),
+                                       lambda: load_signatures(db, session_id))
+    else:
+        aggregate, signatures = session_cache.get(db, session_id), None
+    if aggregate is None:
+        return None, "Session invalide."
+    session_data = aggregate['session']
+
+    # Déterminer les périodes à utiliser
+    if all_periodes:
+        periodes = aggregate['periodes']
+    else:
+        periodes = [p for p in aggregate['periodes'] if p['id'] == periode_id]
+        if not periodes:
+            return None, "Période invalide."
+
+    # Déterminer les candidats à utiliser
+    if all_candidates:
+        candidats = aggregate['candidats']
+    else:
+        candidats = [c for c in aggregate['candidats'] if c['id'] == candidate_id]
+        if not candidats:
+            return None, "Candidat invalide."
+
+    # Vérifier les dates de toutes les périodes avant de générer le PDF
+    for periode in periodes:
+        try:
+            periode_bounds(periode)
+        except ValueError as e:
+            return None, f"Erreur de format de date dans la période : {e}"
+
+    return (session_id, session_data, periodes, candidats, signatures), None
+
+def selection_pdf_key(session_id, session_data, periodes, candidats, signatures):
+    # Clé de cache de la feuille, signatures imprimées comprises
+    signatures_key = signatures_digest(signatures, periodes, candidats) if signatures is not None else None
+    return attendance_pdf_key(session_id, session_data, periodes, candidats, signatures_key)
+
 @app.route('/generate_attendance', methods=['GET', 'POST'])
 def generate_attendance():
-    sessions_ref = db.collection('sessions').order_by('session_number')
-    sessions = []
-    for doc in sessions_ref.stream():
-        session = doc.to_dict()
-        session['id'] = doc.id
-        sessions.append(session)
-    
     if request.method == 'POST':
-        session_id = request.form.get('session_id')
-        periode_id = request.form.get('periode_id')
-        candidate_id = request.form.get('candidate_id')
-        all_candidates = request.form.get('all_candidates')
-        all_periodes = request.form.get('all_periodes')
-
-        session_ref = db.collection('sessions').document(session_id)
-        session = session_ref.get()
-        if not session.exists:
-            flash("Session invalide.", "danger")
+        selection, error = attendance_selection(request.form)
+        if error:
+            flash(error, "danger")
             return redirect(url_for('generate_attendance'))
-        session_data = session.to_dict()
-
-        # Déterminer les périodes à utiliser
-        if all_periodes:
-            periodes_ref = db.collection('periodes').where('session_id', '==', session_id)
-            periodes = [p.to_dict() for p in periodes_ref.stream()]
-        else:
-            periode_ref = db.collection('periodes').document(periode_id)
-            periode = periode_ref.get()
-            if not periode.exists:
-                flash("Période invalide.", "danger")
-                return redirect(url_for('generate_attendance'))
-            periodes = [periode.to_dict()]
-
-        # Déterminer les candidats à utiliser
-        if all_candidates:
-            candidats_ref = db.collection('candidats').where('session_id', '==', session_id)
-            candidats = [c.to_dict() for c in candidats_ref.stream()]
-        else:
-            candidat_ref = db.collection('candidats').document(candidate_id)
-            candidat = candidat_ref.get()
-            if not candidat.exists:
-                flash("Candidat invalide.", "danger")
-                return redirect(url_for('generate_attendance'))
-            candidats = [candidat.to_dict()]
-
-        # Générer le PDF
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-
-        for periode in periodes:
-            try:
-                date_debut_dt = datetime.strptime(periode.get('date_debut', '01/01/1970'), '%d/%m/%Y').date()
-                date_fin_dt = datetime.strptime(periode.get('date_fin', '01/01/1970'), '%d/%m/%Y').date()
-            except Exception as e:
-                flash(f"Erreur de format de date dans la période : {e}", "danger")
-                return redirect(url_for('generate_attendance'))
-            
-            for candidat in candidats:
-                # Titre centré en gras
-                p.setFont("Helvetica-Bold", 18)
-                title = "FEUILLE D'ÉMARGEMENT CFA"
-                title_width = p.stringWidth(title, "Helvetica-Bold", 18)
-                p.drawString((width - title_width) / 2, height - 60, title)
-
-                # Mettre à jour la position Y après le titre
-                current_y = height - 60 - 20  # 20 points d'espace après le titre
-
-                # Nom de la session en italique, centré
-                p.setFont("Helvetica-Oblique", 14)
-                session_title = f"Session {session_data.get('session_number', 'N/A')} - {session_data.get('formation', '')} {session_data.get('site', '')}"
-                session_title_width = p.stringWidth(session_title, "Helvetica-Oblique", 14)
-                p.drawString((width - session_title_width) / 2, current_y, session_title)
-
-                # Mettre à jour la position Y après le titre de la session
-                current_y -= 20  # 20 points d'espace après le titre de la session
-
-                # Informations à gauche
-                p.setFont("Helvetica", 10)
-                p.drawString(50, current_y, f"Candidat : {candidat.get('prenom', '')} {candidat.get('nom', '')}")
-                current_y -= 12  # Espace entre les lignes
-                p.drawString(50, current_y, f"Période : du {periode.get('date_debut', '')} au {periode.get('date_fin', '')}")
-                current_y -= 12
-                p.drawString(50, current_y, f"Nombre d'heures à effectuer : {periode.get('heures', 0)}")
-                current_y -= 15  # Espace supplémentaire avant le tableau
-
-                # Tableau pour l'émargement avec une colonne "Signature CFA"
-                data = [
-                    ["Date", "Matin", "Observation(s)", "Après-midi", "Observation(s)", "Signature CFA"]
-                ]
-                for day in range(0, (date_fin_dt - date_debut_dt).days + 1):
-                    date = date_debut_dt + timedelta(days=day)
-                    data.append([
-                        date.strftime('%d/%m/%Y'),
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                    ])
-
-                # Déterminer la hauteur des lignes en fonction du nombre de dates
-                nb_dates = len(data) - 1
-                if nb_dates > 12:
-                    row_height = 26  # Hauteur réduite pour plus de dates
-                else:
-                    row_height = 32  # Hauteur standard
-
-                # Création du tableau avec une colonne supplémentaire et hauteur ajustée
-                table = Table(data, colWidths=[70, 70, 90, 70, 90, 80], rowHeights=row_height)
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2FAC66")),  # Couleur d'en-tête
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 8),  # Taille de police réduite à 8
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),  # Réduction de l'épaisseur des lignes à 0.5
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Centrer le texte horizontalement
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),  # Centrer le texte verticalement
-                ]))
-                table.wrapOn(p, width, height)
-
-                # Calculer la position verticale disponible
-                # Estimer la hauteur totale du tableau
-                table_height = row_height * len(data)
-                # Positionner le tableau en haut de la page, après les informations
-                table_x = 50
-                table_y = current_y - table_height  # Position dynamique basé sur current_y
-
-                # Dessiner le tableau sans vérification de dépassement
-                table.drawOn(p, table_x, table_y)
-
-                # Mettre à jour current_y après le tableau
-                current_y = table_y - 40  # Espace après le tableau
-
-                # Ajouter "Certifié exact pour le CFA GH le :" et la date
-                p.setFont("Helvetica", 10)
-                cert_text = "Certifié exact pour le CFA GH le :"
-                p.drawString(260, current_y, cert_text)
-
-                # Ajouter un rectangle vide avec "Cachet de l'entreprise" en petit et italique
-                # Définir les dimensions du rectangle
-                rect_width = 200
-                rect_height = 50
-                rect_x = 50
-                rect_y = current_y - 30  # Position ajustée selon l'espace disponible
-
-                p.rect(rect_x, rect_y, rect_width, rect_height, stroke=1, fill=0)
-
-                padding_x = 10  # Espacement horizontal depuis la gauche du rectangle
-                padding_y = 10  # Espacement vertical depuis le haut du rectangle
-
-                # Définir une taille de police réduite
-                p.setFont("Helvetica-Oblique", 8)  # Taille de police réduite à 8
-
-                cachet_text = "Cachet de l'entreprise"
-
-                # Calculer la position `y` pour aligner le texte en haut à gauche
-                text_x = rect_x + padding_x
-                text_y = rect_y + rect_height - padding_y - 8  # 8 est la taille de la police
-
-                p.drawString(text_x, text_y, cachet_text)
-
-                # Passer à une nouvelle page
-                p.showPage()
-
-        # Sauvegarder et envoyer le PDF
-        p.save()
-        buffer.seek(0)
-        return send_file(buffer, as_attachment=True, download_name="feuille_emargement.pdf", mimetype='application/pdf')
+
+        # Redirection vers l'adresse de la feuille, qui dépend de son contenu : le
+        # navigateur ne revalide jamais la réponse d'un POST, celle d'un GET oui
+        return redirect(attendance_file_url(request.form, selection[0], selection_pdf_key(*selection)), 303)
     else:
-        return render_template('attendance_sheet.html', sessions=sessions)
+        # La liste des sessions n'est utile qu'à l'affichage du formulaire
+        filters = page_filters(request.args)
+        sessions, next_cursor = fetch_sessions_page(db, order_by='session_number', descending=True, **filters)
+        return render_template('attendance_sheet.html', sessions=sessions, next_cursor=next_cursor, filters=filters,
+                               site_options=SITE_OPTIONS, formation_options=FORMATION_OPTIONS,
+                               export_jobs_enabled=EXPORT_JOBS_ENABLED)
+
+# Champs du formulaire d'émargement repris dans l'adresse de la feuille
+ATTENDANCE_SELECTION_FIELDS = ('periode_id', 'candidate_id', 'all_periodes', 'all_candidates', 'signatures')
+
+def attendance_file_url(form, session_id, pdf_key):
+    params = {field: form.get(field) for field in ATTENDANCE_SELECTION_FIELDS if form.get(field)}
+    return url_for('attendance_file', session_id=session_id, pdf_key=pdf_key, **params)
+
+@app.route('/attendance/<string:session_id>/<string:pdf_key>.pdf')
+def attendance_file(session_id, pdf_key):
+    # Feuille désignée par l'empreinte de son contenu : tant qu'elle ne change
+    # pas, l'adresse reste la même et le navigateur qui la possède reçoit un 304
+    # sans lecture ni rendu. La sélection, reprise dans les paramètres, permet
+    # de la rendre de nouveau si elle n'est plus dans le cache disque (autre
+    # instance, éviction).
+    if not is_valid_pdf_key(pdf_key) or not is_valid_session_id(session_id):
+        abort(404)
+    if pdf_key in request.if_none_match:
+        return '', 304, {'ETag': f'"{pdf_key}"', 'Cache-Control': 'private, no-cache'}
+
+    pdf_path = pdf_store.get(session_id, pdf_key)
+    if pdf_path is None:
+        # ReportLab n'est chargé que lorsqu'un PDF est demandé
+        from api.attendance_pdf import build_attendance_pdf
+
+        form = dict(request.args.to_dict(), session_id=session_id)
+        selection, error = attendance_selection(form)
+        if not error and selection_pdf_key(*selection) != pdf_key:
+            # Clé différente : l'agrégat en cache sur cette instance peut être
+            # plus ancien que celui qui a produit l'adresse, relire la session
+            session_cache.invalidate(session_id)
+            selection, error = attendance_selection(form)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('generate_attendance'))
+        current_key = selection_pdf_key(*selection)
+        if current_key != pdf_key:
+            # Session modifiée depuis : adresse de la feuille à jour
+            return redirect(attendance_file_url(form, session_id, current_key))
+        _, session_data, periodes, candidats, signatures = selection
+        with build_attendance_pdf(session_data, periodes, candidats, signatures=signatures) as pdf_file:
+            pdf_path = pdf_store.put(session_id, pdf_key, pdf_file)
+
+    response = send_file(pdf_path, as_attachment=True, download_name="feuille_emargement.pdf",
+                         mimetype='application/pdf', etag=pdf_key, conditional=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/exports', methods=['POST'])
+def create_export():
+    # Export en arrière-plan : mêmes champs que generate_attendance, réponse 202
+    # avec l'identifiant de la tâche à suivre sur /exports/<job_id>
+    if not EXPORT_JOBS_ENABLED:
+        return jsonify({"error": "Exports en arrière-plan désactivés."}), 404
+    # Relevée avant la lecture : une modification pendant le rendu l'invalide
+    session_id = request.form.get('session_id')
+    generation = pdf_store.generation(session_id) if is_valid_session_id(session_id) else None
+    selection, error = attendance_selection(request.form)
+    if error:
+        return jsonify({"error": error}), 400
+    session_id, session_data, periodes, candidats, signatures = selection
+
+    pdf_key = selection_pdf_key(*selection)
+    try:
+        job = export_jobs.submit(session_id, pdf_key, session_data, periodes, candidats, signatures, generation)
+    except ExportQueueFull as e:
+        logging.warning("Export refusé : %s", e)
+        return jsonify({"error": "Trop d'exports en cours, réessayez dans quelques instants."}), 429, {'Retry-After': '10'}
+    response = jsonify(export_job_payload(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('export_status', job_id=job['id'])
+    return response
+
+def export_job_payload(job):
+    payload = {
+        "id": job['id'],
+        "status": job['status'],
+        "pages_done": job['pages_done'],
+        "pages_total": job['pages_total'],
+        "status_url": url_for('export_status', job_id=job['id']),
+    }
+    if job['status'] == EXPORT_DONE:
+        payload["download_url"] = url_for('export_download', job_id=job['id'])
+    if job['error']:
+        payload["error"] = job['error']
+    return payload
+
+@app.route('/exports/<string:job_id>')
+def export_status(job_id):
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Export inconnu ou expiré."}), 404
+    response = jsonify(export_job_payload(job))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/exports/<string:job_id>/download')
+def export_download(job_id):
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Export inconnu ou expiré."}), 404
+    if job['status'] != EXPORT_DONE:
+        return jsonify(export_job_payload(job)), 409
+    pdf_path = export_jobs.file_path(job)
+    if pdf_path is None:
+        # Fichier évincé du cache, ou session modifiée depuis : relancer l'export
+        return jsonify({"error": "Le fichier n'est plus disponible, relancez l'export."}), 410
+    response = send_file(pdf_path, as_attachment=True, download_name="feuille_emargement.pdf",
+                         mimetype='application/pdf', etag=job['key'], conditional=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/bulk_export')
+def bulk_export():
+    # Archive ZIP des feuilles (une par session) des sessions actives d'un site
+    # et/ou d'une formation, limitée aux périodes qui recoupent les dates choisies
+    site = request.args.get('site') or None
+    formation = request.args.get('formation') or None
+    try:
+        date_from = datetime.strptime(request.args['date_debut'], '%Y-%m-%d').date() if request.args.get('date_debut') else None
+        date_to = datetime.strptime(request.args['date_fin'], '%Y-%m-%d').date() if request.args.get('date_fin') else None
+    except ValueError:
+        flash("Format de date invalide. Veuillez utiliser le format AAAA-MM-JJ.", "danger")
+        return redirect(url_for('generate_attendance'))
+    if site and site not in SITE_OPTIONS or formation and formation not in FORMATION_OPTIONS:
+        flash("Option de site ou de formation invalide.", "danger")
+        return redirect(url_for('generate_attendance'))
+    if not (site or formation):
+        flash("Choisissez au moins un site ou une formation pour l'export groupé.", "warning")
+        return redirect(url_for('generate_attendance'))
+    if date_from and date_to and date_from > date_to:
+        flash("Erreur : La date de début doit être antérieure ou égale à la date de fin.", "danger")
+        return redirect(url_for('generate_attendance'))
+
+    try:
+        sessions = find_sessions(db, site=site, formation=formation, date_from=date_from, date_to=date_to)
+    except BulkExportError as e:
+        flash(str(e), "warning")
+        return redirect(url_for('generate_attendance'))
+    if not sessions:
+        flash("Aucune session active ne correspond à ces critères.", "info")
+        return redirect(url_for('generate_attendance'))
+
+    logging.info("Export groupé de %d session(s) (site=%s, formation=%s, du %s au %s).",
+                 len(sessions), site, formation, date_from, date_to)
+    # Archive envoyée au fil de sa construction (sans Content-Length)
+    response = Response(stream_with_context(iter_zip(db, sessions, date_from, date_to)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = 'attachment; filename="feuilles_emargement.zip"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 @app.route('/session/<string:session_id>/edit_name', methods=['POST'])
 def edit_session_name(session_id):
@@ -448,6 +503,7 @@ def edit_session_name(session_id):
             'formation': formation,
             'site': site
         })
+        invalidate_session_caches(session_id)
         flash("Nom et site de la session mis à jour avec succès.", "success")
     else:
         flash("Veuillez utiliser le format : 'Nom de la formation - Site'.", "warning")
@@ -455,22 +511,69 @@ def edit_session_name(session_id):
 
 @app.route('/get_periodes/<string:session_id>')
 def get_periodes(session_id):
-    periodes_ref = db.collection('periodes').where('session_id', '==', session_id)
+    aggregate = session_cache.get(db, session_id)
+    periodes = aggregate['periodes'] if aggregate else []
     periodes_data = [
-        {"id": p.id, "date_debut": p.to_dict().get('date_debut', ''), "date_fin": p.to_dict().get('date_fin', '')}
-        for p in periodes_ref.stream()
+        {"id": p['id'], "date_debut": p.get('date_debut', ''), "date_fin": p.get('date_fin', '')}
+        for p in periodes
     ]
     return jsonify({"periodes": periodes_data})
 
 @app.route('/get_candidates/<string:session_id>')
 def get_candidates(session_id):
-    candidats_ref = db.collection('candidats').where('session_id', '==', session_id)
+    aggregate = session_cache.get(db, session_id)
+    candidats = aggregate['candidats'] if aggregate else []
     candidates_data = [
-        {"id": c.id, "nom": c.to_dict().get('nom', ''), "prenom": c.to_dict().get('prenom', '')}
-        for c in candidats_ref.stream()
+        {"id": c['id'], "nom": c.get('nom', ''), "prenom": c.get('prenom', '')}
+        for c in candidats
     ]
     return jsonify({"candidates": candidates_data})
 
+@app.route('/session/<string:session_id>/bundle')
+def session_bundle(session_id):
+    # Session, périodes et candidats en une seule réponse pour le formulaire d'émargement
+    aggregate = session_cache.get(db, session_id)
+    if aggregate is None:
+        return jsonify({"error": "Session non trouvée."}), 404
+    session_data = aggregate['session']
+    payload = {
+        "session": {
+            "id": session_data['id'],
+            "session_number": session_data.get('session_number'),
+            "formation": session_data.get('formation', ''),
+            "site": session_data.get('site', ''),
+            "annule": session_data.get('annule', False),
+        },
+        "periodes": [
+            {"id": p['id'], "date_debut": p.get('date_debut', ''), "date_fin": p.get('date_fin', '')}
+            for p in aggregate['periodes']
+        ],
+        "candidates": [
+            {"id": c['id'], "nom": c.get('nom', ''), "prenom": c.get('prenom', '')}
+            for c in aggregate['candidats']
+        ],
+    }
+    response = jsonify(payload)
+    # Revalidé à chaque affichage : les candidats ajoutés ou supprimés doivent
+    # apparaître aussitôt. ETag faible : calculé sur le JSON, avant compression.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag(weak=True)
+    response.make_conditional(request)
+    if response.status_code == 200 and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify({"session_cache": session_cache.stats(), "export_jobs": export_jobs.stats()})
+
+@app.route('/metrics')
+def metrics():
+    # Format texte Prometheus
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/session/<string:session_id>/add_candidate', methods=['POST'])
 def add_candidate(session_id):
     session_ref = db.collection('sessions').document(session_id)
@@ -486,25 +589,114 @@ def add_candidate(session_id):
         flash("Le nom et le prénom du candidat sont requis.", "warning")
         return redirect(url_for('session_details', session_id=session_id))
 
-    # Optionnel : vérifier si le candidat existe déjà dans la session
-    candidats_ref = db.collection('candidats').where('session_id', '==', session_id)\
-                                           .where('nom', '==', nom.strip())\
-                                           .where('prenom', '==', prenom.strip())
-    if list(candidats_ref.stream()):
+    # Vérifier si le candidat existe déjà dans la session (liste portée par la session)
+    candidats, _ = load_entries(db, session_id, session.to_dict())
+    if candidate_key(nom, prenom) in {candidate_key(c['nom'], c['prenom']) for c in candidats}:
         flash("Ce candidat est déjà inscrit dans cette session.", "info")
         return redirect(url_for('session_details', session_id=session_id))
 
-    # Créer un nouveau candidat
-    candidat_data = {
+    # Créer un nouveau candidat et mettre à jour le résumé de la session
+    add_candidates(db, session_id, [{
         'nom': nom.strip(),
         'prenom': prenom.strip(),
         'session_id': session_id,
-        'created_at': firestore.SERVER_TIMESTAMP
-    }
-    db.collection('candidats').add(candidat_data)
+        'created_at': server_timestamp()
+    }])
+    invalidate_session_caches(session_id)
     flash(f"Candidat {prenom} {nom} ajouté avec succès.", "success")
     return redirect(url_for('session_details', session_id=session_id))
 
+@app.route('/session/<string:session_id>/import_candidates', methods=['POST'])
+def import_candidates_file(session_id):
+    # Inscription en masse depuis un fichier CSV ou Excel (colonnes nom et prénom)
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    session = db.collection('sessions').document(session_id).get()
+    if not session.exists:
+        if wants_json:
+            return jsonify({"error": "Session non trouvée."}), 404
+        flash("Session non trouvée.", "danger")
+        return redirect(url_for('list_sessions'))
+
+    upload = request.files.get('fichier')
+    if upload is None or not upload.filename:
+        if wants_json:
+            return jsonify({"error": "Aucun fichier fourni."}), 400
+        flash("Veuillez choisir un fichier CSV ou Excel.", "warning")
+        return redirect(url_for('session_details', session_id=session_id))
+
+    try:
+        report = import_candidates(db, session_id, iter_candidate_rows(upload.stream, upload.filename))
+    except CandidateImportError as e:
+        invalidate_session_caches(session_id)
+        partial = e.report if e.report and e.report['rows'] else None
+        if partial:
+            logging.warning("Import de candidats interrompu pour la session %s après la ligne %s : %s ajoutés.",
+                            session_id, partial['last_line'], partial['added'])
+        if wants_json:
+            return jsonify({"error": str(e), "report": partial}), 400
+        flash(str(e), "danger")
+        if partial:
+            # Ce qui précède l'erreur est déjà enregistré : ne réimporter que la suite
+            flash(f"Import interrompu après la ligne {partial['last_line']} : {partial['added']} candidat(s) "
+                  f"déjà ajouté(s), {partial['duplicates']} doublon(s) ignoré(s). Ne réimportez que les lignes "
+                  f"suivantes.", "warning")
+        return redirect(url_for('session_details', session_id=session_id))
+
+    if report['added']:
+        invalidate_session_caches(session_id)
+    logging.info("Import de candidats pour la session %s : %s ajoutés, %s doublons, %s erreurs.",
+                 session_id, report['added'], report['duplicates'], len(report['errors']))
+    if wants_json:
+        return jsonify(report)
+
+    flash(f"{report['added']} candidat(s) ajouté(s), {report['duplicates']} doublon(s) ignoré(s).",
+          "success" if report['added'] else "info")
+    # Les premières erreurs suffisent pour corriger le fichier
+    for error in report['errors'][:20]:
+        flash(f"Ligne {error['line']} : {error['message']}", "warning")
+    if len(report['errors']) > 20:
+        flash(f"... et {len(report['errors']) - 20} autre(s) erreur(s).", "warning")
+    return redirect(url_for('session_details', session_id=session_id))
+
+@app.route('/session/<string:session_id>/signer')
+def sign_attendance(session_id):
+    # Émargement numérique : la page embarque tout ce qu'il faut pour signer
+    # hors connexion (périodes, jours ouvrés, candidats, créneaux déjà signés)
+    aggregate = session_cache.get(db, session_id)
+    if aggregate is None:
+        flash("Session introuvable.", "danger")
+        return redirect(url_for('list_sessions'))
+    periodes = [{"id": p['id'], "date_debut": p.get('date_debut', ''), "date_fin": p.get('date_fin', ''),
+                 "jours": list(periode_days(p))} for p in aggregate['periodes']]
+    candidats = [{"id": c['id'], "nom": c.get('nom', ''), "prenom": c.get('prenom', '')}
+                 for c in aggregate['candidats']]
+    return render_template('signature_sheet.html', session=aggregate['session'], session_id=session_id,
+                           periodes=periodes, candidats=candidats, signed=signed_slots(db, session_id),
+                           slots=SLOTS, signature_width=SIGNATURE_WIDTH, signature_height=SIGNATURE_HEIGHT)
+
+@app.route('/session/<string:session_id>/signatures', methods=['GET', 'POST'])
+def sync_signatures(session_id):
+    # GET : créneaux déjà signés ; POST : lot de signatures capturées (hors
+    # connexion le cas échéant), {"signatures": [{p, c, j, s, t, at}, ...]},
+    # gzip accepté. Les signatures refusées sont renvoyées avec leur index.
+    if request.method == 'GET':
+        return jsonify({"signed": signed_slots(db, session_id)})
+
+    aggregate = session_cache.get(db, session_id)
+    if aggregate is None:
+        return jsonify({"error": "Session introuvable."}), 404
+    try:
+        items = read_sync_payload(request.get_data(), request.headers.get('Content-Encoding'))
+        saved, errors = save_signatures(db, session_id, aggregate, items)
+    except SignatureError as e:
+        return jsonify({"error": str(e)}), 400
+    if saved:
+        # Les feuilles signées en cache ne sont plus à jour
+        invalidate_pdf_cache(session_id)
+    if errors:
+        logging.warning("Session %s : %d signature(s) refusée(s) sur %d.", session_id, len(errors), len(items))
+    return jsonify({"saved": saved, "errors": errors})
+
 #if __name__ == '__main__':
 #    port = int(os.getenv("PORT", 5000))
 #       app.run(host='0.0.0.0', port=port, debug=False)
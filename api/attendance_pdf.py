@@ -0,0 +1,260 @@
+# api/attendance_pdf.py
+
+import io
+import os
+import tempfile
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle
+
+from api.metrics import record_pdf
+from api.signatures import SIGNATURE_HEIGHT, SIGNATURE_WIDTH, decode_strokes
+from api.work_calendar import periode_days
+
+# Au-delà de ce nombre de pages, le PDF est produit sur disque et envoyé par blocs
+PDF_STREAMING_THRESHOLD = int(os.getenv('PDF_STREAMING_THRESHOLD', '50'))
+
+# Mise en page commune à toutes les feuilles
+PAGE_WIDTH, PAGE_HEIGHT = A4
+TITLE_Y = PAGE_HEIGHT - 60
+SESSION_TITLE_Y = TITLE_Y - 20  # 20 points d'espace après le titre
+CANDIDAT_Y = SESSION_TITLE_Y - 20  # 20 points d'espace après le titre de la session
+TABLE_TOP_Y = CANDIDAT_Y - 12 - 12 - 15  # Lignes d'information puis espace avant le tableau
+TABLE_X = 50
+
+TABLE_HEADER = ["Date", "Matin", "Observation(s)", "Après-midi", "Observation(s)", "Signature CFA"]
+TABLE_COL_WIDTHS = [70, 70, 90, 70, 90, 80]
+
+# Colonnes du tableau où sont tracées les signatures numériques, par créneau
+SIGNATURE_COLUMNS = {'matin': 1, 'apres_midi': 3}
+SIGNATURE_PADDING = 2
+
+# Style identique pour tous les tableaux, construit une seule fois
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2FAC66")),  # Couleur d'en-tête
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),  # Taille de police réduite à 8
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),  # Réduction de l'épaisseur des lignes à 0.5
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Centrer le texte horizontalement
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),  # Centrer le texte verticalement
+])
+
+
+def count_pages(periodes, candidats):
+    return len(periodes) * len(candidats)
+
+
+def _row_height(nb_dates):
+    # Déterminer la hauteur des lignes en fonction du nombre de dates
+    if nb_dates > 12:
+        return 26  # Hauteur réduite pour plus de dates
+    return 32  # Hauteur standard
+
+
+@lru_cache(maxsize=64)
+def _table_rows(jours):
+    # Lignes du tableau d'une période, en-tête compris : une par jour ouvré,
+    # tels que précalculés sur la période. Seules ces données (immuables) sont
+    # mises en cache.
+    return (tuple(TABLE_HEADER),) + tuple((jour, "", "", "", "", "") for jour in jours)
+
+
+def _attendance_table(jours):
+    # Tableau d'émargement d'une période, construit à chaque rendu : drawOn
+    # attache le canevas au Table le temps du dessin, un même objet ne peut donc
+    # pas servir à deux rendus simultanés (tâches d'export, export groupé).
+    # Le modèle de page ne le dessine qu'une fois par période et par document.
+    row_height = _row_height(len(jours))
+    data = [list(row) for row in _table_rows(jours)]
+    table = Table(data, colWidths=TABLE_COL_WIDTHS, rowHeights=row_height)
+    table.setStyle(TABLE_STYLE)
+    table.wrap(PAGE_WIDTH, PAGE_HEIGHT)
+    return table, row_height * len(data)
+
+
+def _draw_static(p, session_data, periode, jours):
+    # Tout ce qui ne dépend pas du candidat : identique pour une même période
+
+    # Titre centré en gras
+    p.setFont("Helvetica-Bold", 18)
+    title = "FEUILLE D'ÉMARGEMENT CFA"
+    title_width = p.stringWidth(title, "Helvetica-Bold", 18)
+    p.drawString((PAGE_WIDTH - title_width) / 2, TITLE_Y, title)
+
+    # Nom de la session en italique, centré
+    p.setFont("Helvetica-Oblique", 14)
+    session_title = f"Session {session_data.get('session_number', 'N/A')} - {session_data.get('formation', '')} {session_data.get('site', '')}"
+    session_title_width = p.stringWidth(session_title, "Helvetica-Oblique", 14)
+    p.drawString((PAGE_WIDTH - session_title_width) / 2, SESSION_TITLE_Y, session_title)
+
+    # Informations de la période, sous la ligne du candidat
+    p.setFont("Helvetica", 10)
+    p.drawString(50, CANDIDAT_Y - 12, f"Période : du {periode.get('date_debut', '')} au {periode.get('date_fin', '')}")
+    p.drawString(50, CANDIDAT_Y - 24, f"Nombre d'heures à effectuer : {periode.get('heures', 0)}")
+
+    # Tableau pour l'émargement, positionné en haut de la page après les informations
+    table, table_height = _attendance_table(jours)
+    table_y = TABLE_TOP_Y - table_height
+    table.drawOn(p, TABLE_X, table_y)
+
+    # Ajouter "Certifié exact pour le CFA GH le :" et la date
+    current_y = table_y - 40  # Espace après le tableau
+    p.setFont("Helvetica", 10)
+    p.drawString(260, current_y, "Certifié exact pour le CFA GH le :")
+
+    # Ajouter un rectangle vide avec "Cachet de l'entreprise" en petit et italique
+    rect_width = 200
+    rect_height = 50
+    rect_x = 50
+    rect_y = current_y - 30  # Position ajustée selon l'espace disponible
+    p.rect(rect_x, rect_y, rect_width, rect_height, stroke=1, fill=0)
+
+    padding_x = 10  # Espacement horizontal depuis la gauche du rectangle
+    padding_y = 10  # Espacement vertical depuis le haut du rectangle
+    p.setFont("Helvetica-Oblique", 8)  # Taille de police réduite à 8
+    # Aligner le texte en haut à gauche (8 est la taille de la police)
+    p.drawString(rect_x + padding_x, rect_y + rect_height - padding_y - 8, "Cachet de l'entreprise")
+
+
+def _draw_candidat(p, candidat):
+    p.setFont("Helvetica", 10)
+    p.drawString(50, CANDIDAT_Y, f"Candidat : {candidat.get('prenom', '')} {candidat.get('nom', '')}")
+
+
+def _draw_signatures(p, jours, signatures):
+    # Tracés vectoriels des signatures numériques {(jour, créneau): traits},
+    # mis à l'échelle et centrés dans les cellules Matin / Après-midi
+    row_height = _row_height(len(jours))
+    rows = {jour: index for index, jour in enumerate(jours)}
+    p.saveState()
+    p.setLineWidth(0.6)
+    p.setLineCap(1)
+    p.setLineJoin(1)
+    path = p.beginPath()
+    for (jour, creneau), traits in signatures.items():
+        row, column = rows.get(jour), SIGNATURE_COLUMNS.get(creneau)
+        if row is None or column is None:
+            continue
+        width = TABLE_COL_WIDTHS[column] - 2 * SIGNATURE_PADDING
+        height = row_height - 2 * SIGNATURE_PADDING
+        scale = min(width / SIGNATURE_WIDTH, height / SIGNATURE_HEIGHT)
+        left = TABLE_X + sum(TABLE_COL_WIDTHS[:column]) + SIGNATURE_PADDING + (width - SIGNATURE_WIDTH * scale) / 2
+        # Première ligne de dates sous l'en-tête ; y vers le bas dans le repère des tracés
+        top = TABLE_TOP_Y - row_height * (row + 1) - SIGNATURE_PADDING - (height - SIGNATURE_HEIGHT * scale) / 2
+        for stroke in decode_strokes(traits):
+            x, y = stroke[0]
+            path.moveTo(left + x * scale, top - y * scale)
+            if len(stroke) == 1:
+                path.lineTo(left + x * scale + 0.3, top - y * scale)  # Point isolé
+            for x, y in stroke[1:]:
+                path.lineTo(left + x * scale, top - y * scale)
+    p.drawPath(path, stroke=1, fill=0)
+    p.restoreState()
+
+
+def draw_attendance_page(p, session_data, periode, candidat, jours, signatures=None):
+    # Page complète dessinée directement, sans modèle partagé
+    _draw_static(p, session_data, periode, jours)
+    _draw_candidat(p, candidat)
+    if signatures:
+        _draw_signatures(p, jours, signatures)
+    p.showPage()
+
+
+class AttendancePageTemplate:
+    # Les éléments fixes d'une période sont enregistrés une seule fois dans le
+    # document comme Form XObject ; chaque page ne fait que l'appeler et écrire
+    # le nom du candidat.
+
+    def __init__(self, p, session_data):
+        self.p = p
+        self.session_data = session_data
+        self._forms = {}
+
+    def _form_name(self, periode, jours):
+        key = (periode.get('date_debut'), periode.get('date_fin'), periode.get('heures', 0), jours)
+        name = self._forms.get(key)
+        if name is None:
+            name = f"periode{len(self._forms)}"
+            self.p.beginForm(name)
+            _draw_static(self.p, self.session_data, periode, jours)
+            self.p.endForm()
+            self._forms[key] = name
+        return name
+
+    def draw_page(self, periode, candidat, jours, signatures=None):
+        self.p.doForm(self._form_name(periode, jours))
+        _draw_candidat(self.p, candidat)
+        if signatures:
+            _draw_signatures(self.p, jours, signatures)
+        self.p.showPage()
+
+
+def iter_pages(periodes, candidats):
+    # Couples (période, candidat) dans l'ordre du document
+    for periode in periodes:
+        for candidat in candidats:
+            yield periode, candidat
+
+
+def _page_signatures(signatures, periode, candidat):
+    if not signatures:
+        return None
+    return signatures.get((periode.get('id'), candidat.get('id')))
+
+
+def render_pages(output, session_data, pages, signatures=None):
+    # Dessine une page par couple (période, candidat) dans `output` (fichier ou tampon).
+    # Les jours de chaque période sont ceux de periode_days (calendrier précalculé,
+    # sinon dates de la période, validées au préalable avec periode_bounds).
+    # signatures, facultatif : {(periode_id, candidat_id): {(jour, créneau): traits}}
+    p = canvas.Canvas(output, pagesize=A4)
+    template = AttendancePageTemplate(p, session_data)
+    days = {}
+    for periode, candidat in pages:
+        if id(periode) not in days:
+            days[id(periode)] = periode_days(periode)
+        template.draw_page(periode, candidat, days[id(periode)], _page_signatures(signatures, periode, candidat))
+    p.save()
+    return output
+
+
+def _report_progress(pages, progress, total, every=25):
+    # Appelle progress(pages dessinées, total) toutes les `every` pages
+    done = 0
+    for page in pages:
+        yield page
+        done += 1
+        if done % every == 0 or done == total:
+            progress(done, total)
+
+
+def render_attendance_pdf(output, session_data, periodes, candidats, progress=None, signatures=None):
+    pages = iter_pages(periodes, candidats)
+    if progress is not None:
+        pages = _report_progress(pages, progress, count_pages(periodes, candidats))
+    return render_pages(output, session_data, pages, signatures)
+
+
+def build_attendance_pdf(session_data, periodes, candidats, progress=None, signatures=None):
+    # Renvoie un fichier ouvert positionné au début, prêt pour send_file.
+    # Les gros exports sont écrits dans un fichier temporaire, envoyé ensuite par
+    # blocs : pendant le téléchargement, le document n'est plus gardé en mémoire.
+    # ReportLab ne sérialise le document qu'à save(), le premier octet ne peut
+    # donc partir qu'une fois la dernière page dessinée.
+    # progress(pages, total), facultatif, suit l'avancement (tâches d'export) ;
+    # signatures, facultatif, trace les signatures numériques (voir render_pages).
+    pages = count_pages(periodes, candidats)
+    if pages > PDF_STREAMING_THRESHOLD:
+        output = tempfile.TemporaryFile(suffix='.pdf')
+        render_attendance_pdf(output, session_data, periodes, candidats, progress, signatures)
+    else:
+        output = render_attendance_pdf(io.BytesIO(), session_data, periodes, candidats, progress, signatures)
+    record_pdf(pages, output.tell())
+    output.seek(0)
+    return output
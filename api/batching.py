@@ -0,0 +1,69 @@
+# api/batching.py
+
+import logging
+
+# Limite d'opérations par lot imposée par Firestore
+MAX_BATCH_SIZE = 500
+
+
+class BatchWriter:
+    # Regroupe les écritures dans des WriteBatch Firestore, validés par paquets
+    # de MAX_BATCH_SIZE opérations : un aller-retour réseau par paquet au lieu
+    # d'un par document.
+
+    def __init__(self, db, max_size=MAX_BATCH_SIZE):
+        self.db = db
+        self.max_size = max_size
+        self.committed = 0
+        self._batch = None
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # En cas d'erreur, les opérations en attente sont abandonnées
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def _current(self):
+        if self._batch is None:
+            self._batch = self.db.batch()
+        return self._batch
+
+    def _added(self):
+        self._pending += 1
+        if self._pending >= self.max_size:
+            self.commit()
+
+    def set(self, reference, data, merge=False):
+        self._current().set(reference, data, merge=merge)
+        self._added()
+        return reference
+
+    def add(self, collection, data):
+        # Équivalent de collection.add(), l'identifiant étant généré côté client
+        reference = self.db.collection(collection).document()
+        return self.set(reference, data)
+
+    def update(self, reference, data):
+        self._current().update(reference, data)
+        self._added()
+        return reference
+
+    def delete(self, reference):
+        self._current().delete(reference)
+        self._added()
+        return reference
+
+    def commit(self):
+        if self._batch is None or not self._pending:
+            return 0
+        count = self._pending
+        self._batch.commit()
+        self._batch = None
+        self._pending = 0
+        self.committed += count
+        logging.debug("Lot Firestore validé : %d opération(s).", count)
+        return count
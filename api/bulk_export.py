@@ -0,0 +1,178 @@
+# api/bulk_export.py
+
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.utils import secure_filename
+
+from api.pdf_cache import attendance_pdf_key, pdf_store
+from api.session_cache import session_cache
+from api.session_summary import SUMMARY_FIELD
+from api.work_calendar import DEBUT_FIELD, FIN_FIELD, as_date, as_datetime, periode_bounds
+
+# Sessions traitées en parallèle (lecture, rendu, écriture dans le cache) et
+# nombre maximal de sessions par archive
+BULK_EXPORT_WORKERS = int(os.getenv('BULK_EXPORT_WORKERS', '4'))
+BULK_EXPORT_MAX_SESSIONS = int(os.getenv('BULK_EXPORT_MAX_SESSIONS', '200'))
+
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+class BulkExportError(ValueError):
+    pass
+
+
+def _overlaps(debut, fin, date_from, date_to):
+    # Plage [debut, fin] en intersection avec [date_from, date_to] (bornes facultatives)
+    if debut is None or fin is None:
+        return False
+    return (date_to is None or debut <= date_to) and (date_from is None or fin >= date_from)
+
+
+def find_sessions(db, site=None, formation=None, date_from=None, date_to=None, limit=BULK_EXPORT_MAX_SESSIONS):
+    # Sessions actives (non annulées) du site et/ou de la formation, triées par
+    # numéro. Les sessions terminées avant date_from sont écartées par la
+    # requête (date de fin native du résumé, indexée) ; le début du résumé
+    # écarte ensuite sans autre lecture celles qui commencent après date_to.
+    # Le filtre par dates suppose le résumé renseigné sur toutes les sessions
+    # (init_session_summaries.py puis init_periode_calendar.py) : la requête
+    # ne peut pas voir une session sans résumé.fin.
+    query = db.collection('sessions').where('annule', '==', False)
+    if site:
+        query = query.where('site', '==', site)
+    if formation:
+        query = query.where('formation', '==', formation)
+    if date_from:
+        query = query.where(f"{SUMMARY_FIELD}.{FIN_FIELD}", '>=', as_datetime(date_from))
+    query = query.select(['session_number', 'site', 'formation', SUMMARY_FIELD])
+    if not date_to:
+        # Requête exacte : une session de plus que la limite suffit à la refuser
+        query = query.limit(limit + 1)
+
+    sessions = []
+    without_summary = 0
+    for doc in query.stream():
+        data = doc.to_dict()
+        if date_from or date_to:
+            resume = data.get(SUMMARY_FIELD) or {}
+            debut = as_date(resume.get(DEBUT_FIELD)) or as_date(resume.get('date_debut'))
+            fin = as_date(resume.get(FIN_FIELD)) or as_date(resume.get('date_fin'))
+            if debut is None or fin is None:
+                without_summary += 1
+                continue
+            if not _overlaps(debut, fin, date_from, date_to):
+                continue
+        data['id'] = doc.id
+        sessions.append(data)
+        if len(sessions) > limit:
+            raise BulkExportError(f"Plus de {limit} sessions correspondent : affinez les critères.")
+    if without_summary:
+        logging.warning("Export groupé : %d session(s) sans résumé ignorée(s), lancer init_session_summaries.py.",
+                        without_summary)
+    return sorted(sessions, key=lambda session: session.get('session_number') or 0)
+
+
+def _session_pdf(db, session_id, date_from, date_to):
+    # Rend (ou reprend du cache) la feuille d'une session pour les périodes de
+    # la plage ; renvoie (session, chemin du PDF), ou None s'il n'y a rien à imprimer
+    from api.attendance_pdf import build_attendance_pdf
+
+    aggregate = session_cache.get(db, session_id)
+    if aggregate is None:
+        return None
+    periodes = [p for p in aggregate['periodes'] if _overlaps(*_periode_bounds(p), date_from, date_to)]
+    candidats = aggregate['candidats']
+    if not periodes or not candidats:
+        return None
+
+    session_data = aggregate['session']
+    pdf_key = attendance_pdf_key(session_id, session_data, periodes, candidats)
+    pdf_path = pdf_store.get(session_id, pdf_key)
+    if pdf_path is None:
+        with build_attendance_pdf(session_data, periodes, candidats) as pdf_file:
+            pdf_path = pdf_store.put(session_id, pdf_key, pdf_file)
+    return session_data, pdf_path
+
+
+def _periode_bounds(periode):
+    try:
+        return periode_bounds(periode)
+    except ValueError:
+        return None, None
+
+
+def archive_name(session_data):
+    name = f"session_{session_data.get('session_number')}_{session_data.get('formation', '')}_{session_data.get('site', '')}"
+    return secure_filename(name) + '.pdf'
+
+
+class _ZipSink:
+    # Flux non positionnable : zipfile écrit alors chaque entrée avec un
+    # descripteur de données, sans revenir en arrière ; les octets produits sont
+    # récupérés au fur et à mesure par drain()
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _copy_into(zip_file, name, pdf_path, sink):
+    with open(pdf_path, 'rb') as source, zip_file.open(name, 'w') as entry:
+        while True:
+            chunk = source.read(ZIP_CHUNK_SIZE)
+            if not chunk:
+                break
+            entry.write(chunk)
+            data = sink.drain()
+            if data:
+                yield data
+
+
+def _write_archive(db, sink, sessions, futures, date_from, date_to):
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
+        for session, future in zip(sessions, futures):
+            try:
+                result = future.result()
+            except Exception:
+                logging.exception("Export groupé : échec pour la session %s", session['id'])
+                continue
+            if result is None:
+                continue
+            session_data, pdf_path = result
+            try:
+                yield from _copy_into(zip_file, archive_name(session_data), pdf_path, sink)
+            except FileNotFoundError:
+                # Évincé du cache entre le rendu et la copie : rendu à nouveau
+                result = _session_pdf(db, session['id'], date_from, date_to)
+                if result is None:
+                    continue
+                session_data, pdf_path = result
+                yield from _copy_into(zip_file, archive_name(session_data), pdf_path, sink)
+    # Le répertoire central est écrit à la fermeture de l'archive
+    yield sink.drain()
+
+
+def iter_zip(db, sessions, date_from=None, date_to=None, workers=BULK_EXPORT_WORKERS):
+    # Génère l'archive ZIP par morceaux : les sessions sont rendues en parallèle,
+    # leurs PDF ajoutés dans l'ordre dès qu'ils sont prêts ; seul le bloc en
+    # cours de copie transite en mémoire.
+    sink = _ZipSink()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_session_pdf, db, session['id'], date_from, date_to) for session in sessions]
+        try:
+            yield from _write_archive(db, sink, sessions, futures, date_from, date_to)
+        finally:
+            # Téléchargement interrompu : les rendus non commencés sont abandonnés
+            for future in futures:
+                future.cancel()
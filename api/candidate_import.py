@@ -0,0 +1,178 @@
+# api/candidate_import.py
+
+import csv
+import os
+import unicodedata
+
+from api.session_summary import MAX_CANDIDATES_PER_TRANSACTION, add_candidates, load_entries
+from api.storage import server_timestamp
+
+# Nombre maximal de lignes traitées par fichier importé
+CANDIDATE_IMPORT_MAX_ROWS = int(os.getenv('CANDIDATE_IMPORT_MAX_ROWS', '5000'))
+# Longueur maximale d'un nom ou d'un prénom
+MAX_NAME_LENGTH = 100
+
+IMPORT_EXTENSIONS = ('.csv', '.txt', '.xlsx')
+
+
+class CandidateImportError(ValueError):
+    # Fichier illisible (format non pris en charge, contenu corrompu) : l'import
+    # s'arrête. report : bilan des lignes déjà lues et enregistrées (voir
+    # import_candidates), None si l'erreur survient avant l'import.
+    report = None
+
+
+def normalize_name(value):
+    # Espaces superflus supprimés, forme Unicode composée (é saisi en un ou deux caractères)
+    if value is None:
+        return ''
+    return ' '.join(unicodedata.normalize('NFC', str(value)).split())
+
+
+def candidate_key(nom, prenom):
+    # Clé de doublon : insensible à la casse et aux espaces
+    return (normalize_name(nom).casefold(), normalize_name(prenom).casefold())
+
+
+def _header_label(value):
+    # 'Prénom ' -> 'prenom'
+    text = unicodedata.normalize('NFKD', normalize_name(value).lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def _decode_lines(stream):
+    # Lignes décodées une à une : UTF-8 (avec ou sans BOM), sinon Windows-1252
+    # comme les CSV enregistrés par Excel
+    first = True
+    for raw in stream:
+        if first:
+            raw = raw.removeprefix(b'\xef\xbb\xbf')
+            first = False
+        try:
+            yield raw.decode('utf-8')
+        except UnicodeDecodeError:
+            yield raw.decode('cp1252', errors='replace')
+
+
+def _csv_rows(stream):
+    lines = _decode_lines(stream)
+    first_line = next(lines, None)
+    if first_line is None:
+        return
+    # Excel en français sépare par ';', les autres outils par ',' ou tabulation
+    delimiter = max(';,\t', key=first_line.count)
+
+    def all_lines():
+        yield first_line
+        yield from lines
+
+    try:
+        yield from csv.reader(all_lines(), delimiter=delimiter)
+    except csv.Error as e:
+        raise CandidateImportError(f"Fichier CSV illisible : {e}")
+
+
+def _xlsx_rows(stream):
+    # openpyxl n'est chargé que pour les imports Excel ; le mode lecture seule
+    # parcourt la feuille sans la charger entièrement en mémoire
+    from openpyxl import load_workbook
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise CandidateImportError(f"Fichier Excel illisible : {e}")
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if cell is None else cell for cell in row]
+    finally:
+        workbook.close()
+
+
+def iter_candidate_rows(stream, filename):
+    # (numéro de ligne, nom, prénom) pour chaque ligne non vide du fichier.
+    # Si la première ligne contient les colonnes 'nom' et 'prénom', elles sont
+    # utilisées ; sinon les deux premières colonnes sont le nom puis le prénom.
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in IMPORT_EXTENSIONS:
+        raise CandidateImportError("Format non pris en charge : fichier .csv ou .xlsx attendu.")
+    rows = _xlsx_rows(stream) if extension == '.xlsx' else _csv_rows(stream)
+
+    nom_index, prenom_index = 0, 1
+    for line, row in enumerate(rows, start=1):
+        if line == 1:
+            labels = [_header_label(cell) for cell in row]
+            if 'nom' in labels and 'prenom' in labels:
+                nom_index, prenom_index = labels.index('nom'), labels.index('prenom')
+                continue
+        if not any(normalize_name(cell) for cell in row):
+            continue
+        nom = row[nom_index] if len(row) > nom_index else ''
+        prenom = row[prenom_index] if len(row) > prenom_index else ''
+        yield line, normalize_name(nom), normalize_name(prenom)
+
+
+def existing_candidate_keys(db, session_id):
+    # Candidats déjà inscrits, lus dans le résumé de la session (une seule lecture) ;
+    # None si la session n'existe pas
+    session = db.collection('sessions').document(session_id).get()
+    if not session.exists:
+        return None
+    candidats, _ = load_entries(db, session_id, session.to_dict())
+    return {candidate_key(c['nom'], c['prenom']) for c in candidats}
+
+
+def import_candidates(db, session_id, rows, max_rows=CANDIDATE_IMPORT_MAX_ROWS):
+    # Ajoute les candidats valides au fil de la lecture, par transactions de
+    # MAX_CANDIDATES_PER_TRANSACTION qui mettent aussi à jour le résumé de la
+    # session. Renvoie le bilan : lignes lues, candidats ajoutés, doublons
+    # ignorés et erreurs ligne par ligne. Si le fichier devient illisible en
+    # cours de route, les lignes déjà lues sont enregistrées et le bilan
+    # partiel (last_line : dernière ligne lue) est joint à CandidateImportError.
+    known = existing_candidate_keys(db, session_id) or set()
+    report = {'rows': 0, 'added': 0, 'duplicates': 0, 'errors': []}
+    pending = []
+
+    def flush():
+        if pending:
+            add_candidates(db, session_id, pending)
+            report['added'] += len(pending)
+            pending.clear()
+
+    last_line = 0
+    try:
+        for line, nom, prenom in rows:
+            last_line = line
+            if report['rows'] >= max_rows:
+                report['errors'].append({'line': line, 'message':
+                                         f"Import limité à {max_rows} lignes : la suite du fichier est ignorée."})
+                break
+            report['rows'] += 1
+
+            if not nom or not prenom:
+                report['errors'].append({'line': line, 'message': "Nom ou prénom manquant."})
+                continue
+            if len(nom) > MAX_NAME_LENGTH or len(prenom) > MAX_NAME_LENGTH:
+                report['errors'].append({'line': line, 'message':
+                                         f"Nom ou prénom de plus de {MAX_NAME_LENGTH} caractères."})
+                continue
+
+            key = candidate_key(nom, prenom)
+            if key in known:
+                report['duplicates'] += 1
+                continue
+            known.add(key)
+
+            pending.append({
+                'nom': nom,
+                'prenom': prenom,
+                'session_id': session_id,
+                'created_at': server_timestamp()
+            })
+            if len(pending) >= MAX_CANDIDATES_PER_TRANSACTION:
+                flush()
+    except CandidateImportError as e:
+        flush()
+        report['last_line'] = last_line
+        e.report = report
+        raise
+    flush()
+    return report
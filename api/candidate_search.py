@@ -0,0 +1,100 @@
+# api/candidate_search.py
+
+import unicodedata
+
+from api.batching import BatchWriter
+
+# Champ de chaque document candidats : préfixes normalisés des mots du nom et
+# du prénom ('dupont' -> 'du', 'dup', ..., 'dupont'), interrogé par array_contains
+SEARCH_TOKENS_FIELD = 'search_tokens'
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 15
+
+SEARCH_MAX_RESULTS = 20
+# Candidats lus au plus pour une recherche de plusieurs mots, dont seuls ceux
+# qui correspondent aussi aux autres mots sont retenus
+SEARCH_SCAN_LIMIT = 500
+
+
+def normalize_search_text(value):
+    # Minuscules, sans accents ; tirets et apostrophes séparent les mots
+    text = unicodedata.normalize('NFKD', str(value or '').lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ''.join(c if c.isalnum() else ' ' for c in text).split()
+
+
+def search_tokens(nom, prenom):
+    tokens = set()
+    for word in normalize_search_text(nom) + normalize_search_text(prenom):
+        for length in range(MIN_PREFIX_LENGTH, min(len(word), MAX_PREFIX_LENGTH) + 1):
+            tokens.add(word[:length])
+    return sorted(tokens)
+
+
+def with_search_tokens(data):
+    # Copie des champs d'un candidat, complétée de son index de recherche
+    return dict(data, **{SEARCH_TOKENS_FIELD: search_tokens(data.get('nom'), data.get('prenom'))})
+
+
+def _matches(words, nom, prenom):
+    # Chaque mot saisi doit commencer un mot du nom ou du prénom
+    candidate_words = normalize_search_text(nom) + normalize_search_text(prenom)
+    return all(any(word.startswith(term) for word in candidate_words) for term in words)
+
+
+def search_candidates(db, text, limit=SEARCH_MAX_RESULTS):
+    # Candidats dont le nom ou le prénom commence par chacun des mots saisis,
+    # avec la session de chacun : une requête sur le mot le plus long (le plus
+    # sélectif), puis une lecture groupée des sessions
+    terms = [term[:MAX_PREFIX_LENGTH] for term in normalize_search_text(text)]
+    terms = [term for term in terms if len(term) >= MIN_PREFIX_LENGTH]
+    if not terms:
+        return []
+    pivot = max(terms, key=len)
+
+    query = db.collection('candidats').where(SEARCH_TOKENS_FIELD, 'array_contains', pivot)\
+                                      .select(['nom', 'prenom', 'session_id'])\
+                                      .limit(SEARCH_SCAN_LIMIT if len(terms) > 1 else limit)
+    candidats = []
+    for doc in query.stream():
+        data = doc.to_dict()
+        if _matches(terms, data.get('nom'), data.get('prenom')):
+            data['id'] = doc.id
+            candidats.append(data)
+            if len(candidats) >= limit:
+                break
+
+    session_ids = sorted({c['session_id'] for c in candidats if c.get('session_id')})
+    references = [db.collection('sessions').document(session_id) for session_id in session_ids]
+    sessions = {}
+    if references:
+        for snapshot in db.get_all(references, field_paths=['session_number', 'formation', 'site', 'annule']):
+            if snapshot.exists:
+                sessions[snapshot.id] = dict(snapshot.to_dict(), id=snapshot.id)
+
+    results = []
+    for candidat in candidats:
+        session = sessions.get(candidat.get('session_id'))
+        if session is None:
+            continue  # Candidat orphelin d'une session supprimée
+        results.append({'id': candidat['id'], 'nom': candidat.get('nom', ''),
+                        'prenom': candidat.get('prenom', ''), 'session': session})
+    results.sort(key=lambda r: (r['nom'].lower(), r['prenom'].lower(), -(r['session'].get('session_number') or 0)))
+    return results
+
+
+def backfill_search_tokens(db, force=False):
+    # Renseigne l'index de recherche des candidats qui ne l'ont pas (tous si
+    # force) ; renvoie (candidats parcourus, candidats mis à jour)
+    seen = updated = 0
+    query = db.collection('candidats').select(['nom', 'prenom', SEARCH_TOKENS_FIELD])
+    with BatchWriter(db) as batch:
+        for doc in query.stream():
+            seen += 1
+            data = doc.to_dict()
+            tokens = search_tokens(data.get('nom'), data.get('prenom'))
+            if not force and data.get(SEARCH_TOKENS_FIELD) == tokens:
+                continue
+            batch.update(doc.reference, {SEARCH_TOKENS_FIELD: tokens})
+            updated += 1
+    return seen, updated
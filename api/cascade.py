@@ -0,0 +1,90 @@
+# api/cascade.py
+
+import logging
+
+from api.batching import BatchWriter
+from api.parallel_reads import gather, stream_references
+from api.session_summary import MAX_CANDIDATES_PER_TRANSACTION, remove_candidate
+
+# Collections dont les documents référencent une session par `session_id`
+SESSION_CHILD_COLLECTIONS = ('candidats', 'periodes', 'signatures')
+
+
+# Projection sur l'identifiant seul (valeur de FieldPath.document_id(), sans
+# importer le SDK) : les documents sont renvoyés sans leurs champs. Une
+# projection vide, elle, renvoie tous les champs.
+DOCUMENT_ID_FIELD = '__name__'
+
+
+def _child_queries(db, session_id):
+    return [db.collection(collection).where('session_id', '==', session_id).select([DOCUMENT_ID_FIELD])
+            for collection in SESSION_CHILD_COLLECTIONS]
+
+
+def session_child_references(db, session_id):
+    # Les requêtes sur les collections filles sont lancées en parallèle
+    results = gather(*[lambda query=query: stream_references(query) for query in _child_queries(db, session_id)])
+    return [reference for references in results for reference in references]
+
+
+def _delete(db, session_ref, children):
+    # Les documents enfants sont supprimés avant la session, qui part dans le
+    # dernier lot : si l'opération est interrompue, la session existe encore et
+    # un nouvel appel reprend le travail là où il s'est arrêté. Supprimer un
+    # document absent n'est pas une erreur, l'opération est donc idempotente.
+    with BatchWriter(db) as batch:
+        for reference in children:
+            batch.delete(reference)
+        batch.delete(session_ref)
+    logging.debug("Session %s supprimée avec %d document(s) lié(s).", session_ref.id, len(children))
+    return len(children)
+
+
+def delete_session_cascade(db, session_id):
+    return _delete(db, db.collection('sessions').document(session_id), session_child_references(db, session_id))
+
+
+def delete_existing_session(db, session_id):
+    # Comme delete_session_cascade, si la session existe (None sinon) : sa
+    # lecture et celles des collections filles partent en même temps
+    session_ref = db.collection('sessions').document(session_id)
+    snapshot, *results = gather(session_ref.get,
+                                *[lambda query=query: stream_references(query) for query in _child_queries(db, session_id)])
+    if not snapshot.exists:
+        return None
+    return _delete(db, session_ref, [reference for references in results for reference in references])
+
+
+def candidate_signature_references(db, session_id, candidate_id):
+    query = (db.collection('signatures').where('session_id', '==', session_id)
+             .where('candidat_id', '==', candidate_id).select([DOCUMENT_ID_FIELD]))
+    return stream_references(query)
+
+
+def delete_candidate_cascade(db, session_id, candidate_id):
+    # Supprime le candidat avec ses signatures, qui sinon resteraient jusqu'à la
+    # suppression de la session. Elles partent dans la transaction qui retire
+    # le candidat du résumé ; celles qui n'y tiennent pas sont supprimées avant,
+    # tant que le candidat existe encore (un nouvel appel reprend le travail).
+    # Renvoie False si la session n'existe plus : candidat et signatures
+    # orphelins sont alors supprimés ensemble.
+    signatures = candidate_signature_references(db, session_id, candidate_id)
+    capacity = MAX_CANDIDATES_PER_TRANSACTION - 1
+    if len(signatures) > capacity:
+        with BatchWriter(db) as batch:
+            for reference in signatures[capacity:]:
+                batch.delete(reference)
+        signatures = signatures[:capacity]
+    if remove_candidate(db, session_id, candidate_id, signatures):
+        return True
+    with BatchWriter(db) as batch:
+        for reference in signatures:
+            batch.delete(reference)
+        batch.delete(db.collection('candidats').document(candidate_id))
+    return False
+
+
+def delete_sessions_cascade(db, session_ids):
+    # Purge de plusieurs sessions (archivage, nettoyage) ; renvoie le nombre de
+    # documents enfants supprimés par session
+    return {session_id: delete_session_cascade(db, session_id) for session_id in session_ids}
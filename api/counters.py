@@ -0,0 +1,83 @@
+# api/counters.py
+
+import os
+import threading
+import logging
+
+from api.storage import DESCENDING, run_transaction
+
+# Document compteur initialisé par init_counter.py
+COUNTERS_COLLECTION = 'counters'
+SESSIONS_COUNTER = 'sessions'
+
+# Nombre de numéros réservés par transaction (1 = numérotation strictement continue)
+SESSION_NUMBER_BLOCK_SIZE = max(1, int(os.getenv('SESSION_NUMBER_BLOCK_SIZE', '1')))
+
+
+def session_counter_ref(db):
+    return db.collection(COUNTERS_COLLECTION).document(SESSIONS_COUNTER)
+
+
+def max_session_number(db):
+    # Une seule lecture : la session portant le plus grand numéro
+    query = db.collection('sessions').order_by('session_number', direction=DESCENDING).limit(1)
+    for doc in query.stream():
+        return doc.to_dict().get('session_number') or 0
+    return 0
+
+
+def _reserve_in_transaction(transaction, db, counter_ref, count):
+    snapshot = counter_ref.get(transaction=transaction)
+    if snapshot.exists:
+        current = snapshot.to_dict().get('current', 0)
+    else:
+        # Compteur absent : on repart du plus grand numéro existant
+        current = max_session_number(db)
+    transaction.set(counter_ref, {'current': current + count}, merge=True)
+    return current + 1
+
+
+def reserve_session_numbers(db, count=1):
+    # Réserve atomiquement `count` numéros consécutifs et renvoie leur plage
+    if count < 1:
+        raise ValueError("Le nombre de numéros à réserver doit être positif.")
+    first = run_transaction(db, _reserve_in_transaction, db, session_counter_ref(db), count)
+    return range(first, first + count)
+
+
+class SessionNumberAllocator:
+    # Distribue les numéros de session par blocs réservés en une seule transaction,
+    # pour absorber les rafales de créations sans une transaction par session.
+
+    def __init__(self, db, block_size=SESSION_NUMBER_BLOCK_SIZE):
+        self.db = db
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._block = iter(())
+
+    def next_number(self):
+        with self._lock:
+            number = next(self._block, None)
+            if number is None:
+                self._block = iter(reserve_session_numbers(self.db, self.block_size))
+                number = next(self._block)
+            return number
+
+
+def _reconcile_in_transaction(transaction, counter_ref, highest):
+    snapshot = counter_ref.get(transaction=transaction)
+    current = snapshot.to_dict().get('current', 0) if snapshot.exists else None
+    if current is None or current < highest:
+        transaction.set(counter_ref, {'current': highest}, merge=True)
+        return current, highest
+    return current, current
+
+
+def reconcile_session_counter(db):
+    # Répare la dérive du compteur : il ne doit jamais être inférieur au plus grand
+    # numéro attribué, sinon deux sessions recevraient le même numéro.
+    highest = max_session_number(db)
+    previous, current = run_transaction(db, _reconcile_in_transaction, session_counter_ref(db), highest)
+    if previous != current:
+        logging.warning("Compteur de sessions corrigé : %s -> %s.", previous, current)
+    return previous, current
@@ -0,0 +1,147 @@
+# api/export_jobs.py
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from api.pdf_cache import pdf_store
+
+# Exports rendus simultanément, exports en attente acceptés au maximum, et
+# durée (secondes) pendant laquelle une tâche terminée reste consultable
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', '2'))
+EXPORT_JOB_MAX_PENDING = int(os.getenv('EXPORT_JOB_MAX_PENDING', '20'))
+EXPORT_JOB_TTL = int(os.getenv('EXPORT_JOB_TTL', '3600'))
+
+# File d'exports activée (EXPORT_JOBS=1) seulement quand un même processus
+# durable sert toutes les requêtes : sur une plateforme serverless (Vercel), le
+# suivi peut arriver sur une autre instance et les threads sont gelés après la
+# réponse. Désactivée, les exports passent par generate_attendance.
+EXPORT_JOBS_ENABLED = os.getenv('EXPORT_JOBS', '0') == '1'
+
+PENDING = 'en_attente'
+RUNNING = 'en_cours'
+DONE = 'termine'
+FAILED = 'erreur'
+
+
+class ExportQueueFull(Exception):
+    pass
+
+
+class ExportJobQueue:
+    # File d'exports PDF traités en arrière-plan par un pool de threads : la
+    # requête HTTP ne fait qu'enregistrer la tâche, le client suit ensuite son
+    # avancement puis télécharge le fichier. Les tâches sont gardées en mémoire,
+    # propres au processus : derrière plusieurs instances, le suivi doit revenir
+    # sur l'instance qui a reçu la demande. Le PDF produit est rangé dans le
+    # cache disque (pdf_store), partagé avec les exports synchrones.
+
+    def __init__(self, workers=EXPORT_JOB_WORKERS, max_pending=EXPORT_JOB_MAX_PENDING, ttl=EXPORT_JOB_TTL):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        # Threads créés au premier export seulement
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export')
+        return self._executor
+
+    def submit(self, session_id, pdf_key, session_data, periodes, candidats, signatures=None, generation=None):
+        # Enregistre un export et renvoie son état ; un export identique déjà en
+        # cours ou terminé est réutilisé. signatures : voir build_attendance_pdf ;
+        # generation : pdf_store.generation(session_id) relevée avant de lire la
+        # session, le PDF n'est pas gardé si la session a été modifiée depuis
+        with self._lock:
+            self._expire()
+            for job in self._jobs.values():
+                if job['session_id'] != session_id or job['key'] != pdf_key or job['status'] == FAILED:
+                    continue
+                if job['status'] == DONE and self.file_path(job) is None:
+                    continue
+                return dict(job)
+            active = sum(1 for job in self._jobs.values() if job['status'] in (PENDING, RUNNING))
+            if active >= self.max_pending:
+                raise ExportQueueFull(f"{active} exports déjà en attente.")
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'session_id': session_id,
+                'key': pdf_key,
+                'generation': generation,
+                'status': PENDING,
+                'pages_done': 0,
+                'pages_total': len(periodes) * len(candidats),
+                'error': None,
+                'created_at': time.time(),
+                'finished_at': None,
+            }
+            self._jobs[job['id']] = job
+            self._get_executor().submit(self._run, job['id'], session_data, periodes, candidats, signatures)
+            return dict(job)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _run(self, job_id, session_data, periodes, candidats, signatures=None):
+        from api.attendance_pdf import build_attendance_pdf
+
+        with self._lock:
+            job = dict(self._jobs[job_id])
+        self._update(job_id, status=RUNNING)
+        try:
+            if pdf_store.get(job['session_id'], job['key']) is None:
+                def progress(done, total):
+                    self._update(job_id, pages_done=done)
+
+                with build_attendance_pdf(session_data, periodes, candidats, progress, signatures) as pdf_file:
+                    stored = pdf_store.put(job['session_id'], job['key'], pdf_file, job['generation'])
+                if stored is None:
+                    logging.info("Export %s abandonné : session modifiée pendant le rendu.", job_id)
+                    self._update(job_id, status=FAILED, finished_at=time.time(),
+                                 error="La session a été modifiée pendant l'export, relancez-le.")
+                    return
+            self._update(job_id, status=DONE, pages_done=job['pages_total'], finished_at=time.time())
+            logging.info("Export %s terminé (%d pages).", job_id, job['pages_total'])
+        except Exception as e:
+            logging.exception("Échec de l'export %s", job_id)
+            self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def file_path(self, job):
+        # Fichier d'un export terminé, ou None s'il a été évincé ou invalidé depuis
+        if job['status'] != DONE:
+            return None
+        return pdf_store.get(job['session_id'], job['key'])
+
+    def _expire(self):
+        # Appelé verrou tenu : oublie les tâches terminées depuis plus de ttl secondes
+        limit = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job['finished_at'] is not None and job['finished_at'] < limit]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            counts = {status: 0 for status in (PENDING, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            return counts
+
+
+export_jobs = ExportJobQueue()
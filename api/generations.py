@@ -0,0 +1,47 @@
+# api/generations.py
+
+import itertools
+import threading
+from collections import OrderedDict
+
+# Sessions suivies au maximum par compteur
+GENERATIONS_MAX_SIZE = 4096
+
+
+class Generations:
+    # Génération de chaque session, changée à chaque invalidation : une lecture
+    # relève la génération avant de commencer et ne garde son résultat que si
+    # elle n'a pas changé entre-temps.
+    # Les valeurs viennent d'un compteur global et ne se répètent jamais. Seules
+    # les max_size sessions invalidées le plus récemment sont gardées ; une
+    # session oubliée prend la plus grande valeur évincée (plancher), ce qui ne
+    # peut que faire écarter un résultat en trop, jamais en garder un périmé.
+
+    def __init__(self, max_size=GENERATIONS_MAX_SIZE):
+        self.max_size = max_size
+        self._values = OrderedDict()
+        self._counter = itertools.count(1)
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            return self._values.get(session_id, self._floor)
+
+    def bump(self, session_id):
+        with self._lock:
+            self._values[session_id] = next(self._counter)
+            self._values.move_to_end(session_id)
+            while len(self._values) > self.max_size:
+                _, value = self._values.popitem(last=False)
+                self._floor = max(self._floor, value)
+
+    def bump_all(self):
+        # Toutes les sessions changent de génération (vidage complet d'un cache)
+        with self._lock:
+            self._values.clear()
+            self._floor = next(self._counter)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._values)
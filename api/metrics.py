@@ -0,0 +1,357 @@
+# api/metrics.py
+
+import contextvars
+import os
+import random
+import threading
+import time
+
+# Proportion des requêtes mesurées (0 désactive la mesure, 1 mesure tout)
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '1.0'))
+
+# Bornes (secondes) de l'histogramme des durées de requête
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Opérations Firestore comptées par requête
+FIRESTORE_KINDS = ('reads', 'queries', 'documents', 'writes', 'commits')
+
+# Mesures de la requête en cours (None si elle n'est pas échantillonnée)
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    # Compteurs d'une requête. Les objets Firestore instrumentés gardent une
+    # référence vers l'instance active à leur création : les lectures lancées
+    # depuis un pool de threads sont ainsi attribuées à la bonne requête.
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.firestore = dict.fromkeys(FIRESTORE_KINDS, 0)
+        self.firestore_seconds = 0.0
+        self.pdf_pages = 0
+        self.pdf_bytes = 0
+        self._lock = threading.Lock()
+
+    def count(self, kind, amount=1, seconds=0.0):
+        with self._lock:
+            self.firestore[kind] += amount
+            self.firestore_seconds += seconds
+
+    def add_pdf(self, pages, size):
+        with self._lock:
+            self.pdf_pages += pages
+            self.pdf_bytes += size
+
+
+def start_request():
+    # Renvoie les mesures de la nouvelle requête, ou None si elle n'est pas échantillonnée
+    if METRICS_SAMPLE_RATE <= 0 or (METRICS_SAMPLE_RATE < 1 and random.random() >= METRICS_SAMPLE_RATE):
+        _current.set(None)
+        return None
+    metrics = RequestMetrics()
+    _current.set(metrics)
+    return metrics
+
+
+def current_request():
+    return _current.get()
+
+
+def end_request():
+    _current.set(None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class Registry:
+    # Agrégats exposés au format texte Prometheus par /metrics. Propre au
+    # processus : avec plusieurs workers gunicorn, chaque worker a ses valeurs.
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._latency = {}      # (route, méthode) -> [comptes par borne..., somme, total]
+        self._requests = {}     # (route, méthode, statut) -> nombre
+        self._firestore = {}    # (route, type) -> nombre
+        self._pdf = {'pages': 0, 'bytes': 0, 'documents': 0}
+
+    def observe_request(self, route, method, status, seconds, metrics):
+        with self._lock:
+            histogram = self._latency.setdefault((route, method), [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            key = (route, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for kind, amount in metrics.firestore.items():
+                if amount:
+                    self._firestore[(route, kind)] = self._firestore.get((route, kind), 0) + amount
+
+    def observe_pdf(self, pages, size):
+        with self._lock:
+            self._pdf['pages'] += pages
+            self._pdf['bytes'] += size
+            self._pdf['documents'] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append('# HELP emargement_request_duration_seconds Durée de traitement des requêtes HTTP.')
+            lines.append('# TYPE emargement_request_duration_seconds histogram')
+            for (route, method), histogram in sorted(self._latency.items()):
+                labels = _labels(('route', 'method'), (route, method))
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'emargement_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'emargement_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+                lines.append(f'emargement_request_duration_seconds_sum{{{labels}}} {histogram[-2]:.6f}')
+                lines.append(f'emargement_request_duration_seconds_count{{{labels}}} {histogram[-1]}')
+
+            lines.append('# HELP emargement_requests_total Requêtes HTTP mesurées, par statut.')
+            lines.append('# TYPE emargement_requests_total counter')
+            for key, count in sorted(self._requests.items()):
+                lines.append(f'emargement_requests_total{{{_labels(("route", "method", "status"), key)}}} {count}')
+
+            lines.append('# HELP emargement_firestore_operations_total Opérations Firestore par route et par type.')
+            lines.append('# TYPE emargement_firestore_operations_total counter')
+            for key, count in sorted(self._firestore.items()):
+                lines.append(f'emargement_firestore_operations_total{{{_labels(("route", "kind"), key)}}} {count}')
+
+            lines.append('# HELP emargement_pdf_documents_total PDF générés.')
+            lines.append('# TYPE emargement_pdf_documents_total counter')
+            lines.append(f"emargement_pdf_documents_total {self._pdf['documents']}")
+            lines.append('# HELP emargement_pdf_pages_total Pages PDF générées.')
+            lines.append('# TYPE emargement_pdf_pages_total counter')
+            lines.append(f"emargement_pdf_pages_total {self._pdf['pages']}")
+            lines.append('# HELP emargement_pdf_bytes_total Octets de PDF générés.')
+            lines.append('# TYPE emargement_pdf_bytes_total counter')
+            lines.append(f"emargement_pdf_bytes_total {self._pdf['bytes']}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def record_pdf(pages, size):
+    # Appelé après chaque rendu, y compris hors requête (tâches d'export)
+    registry.observe_pdf(pages, size)
+    metrics = current_request()
+    if metrics is not None:
+        metrics.add_pdf(pages, size)
+
+
+def server_timing(metrics):
+    # Valeur de l'en-tête Server-Timing de la requête (ASCII : c'est un en-tête HTTP)
+    total = (time.perf_counter() - metrics.start) * 1000
+    counts = metrics.firestore
+    parts = [
+        f'app;dur={total:.1f}',
+        f'firestore;dur={metrics.firestore_seconds * 1000:.1f};desc="reads={counts["reads"]} '
+        f'queries={counts["queries"]} docs={counts["documents"]} writes={counts["writes"]}"',
+    ]
+    if metrics.pdf_pages:
+        parts.append(f'pdf;desc="pages={metrics.pdf_pages} bytes={metrics.pdf_bytes}"')
+    return ', '.join(parts)
+
+
+class _Proxy:
+    # Transmet tout attribut non redéfini à l'objet Firestore d'origine, ce qui
+    # permet de passer un objet instrumenté là où le SDK attend l'original
+    # (transaction.set(référence, ...), start_after(...), get_all(...))
+
+    def __init__(self, target, metrics):
+        self._target = target
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def _count(self, kind, amount=1, seconds=0.0):
+        if self._metrics is not None:
+            self._metrics.count(kind, amount, seconds)
+
+
+def _unwrap(value):
+    return value._target if isinstance(value, _Proxy) else value
+
+
+class InstrumentedQuery(_Proxy):
+    def _derive(self, name, *args, **kwargs):
+        args = [_unwrap(arg) for arg in args]
+        return InstrumentedQuery(getattr(self._target, name)(*args, **kwargs), self._metrics)
+
+    def where(self, *args, **kwargs):
+        return self._derive('where', *args, **kwargs)
+
+    def order_by(self, *args, **kwargs):
+        return self._derive('order_by', *args, **kwargs)
+
+    def limit(self, *args, **kwargs):
+        return self._derive('limit', *args, **kwargs)
+
+    def select(self, *args, **kwargs):
+        return self._derive('select', *args, **kwargs)
+
+    def start_after(self, *args, **kwargs):
+        return self._derive('start_after', *args, **kwargs)
+
+    def start_at(self, *args, **kwargs):
+        return self._derive('start_at', *args, **kwargs)
+
+    def end_before(self, *args, **kwargs):
+        return self._derive('end_before', *args, **kwargs)
+
+    def end_at(self, *args, **kwargs):
+        return self._derive('end_at', *args, **kwargs)
+
+    def stream(self, *args, **kwargs):
+        # Temps compté pendant l'itération seulement, pas pendant le traitement de l'appelant
+        start = time.perf_counter()
+        documents = 0
+        iterator = iter(self._target.stream(*args, **kwargs))
+        elapsed = time.perf_counter() - start
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    snapshot = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - start
+                    return
+                elapsed += time.perf_counter() - start
+                documents += 1
+                yield snapshot
+        finally:
+            self._count('queries', 1, elapsed)
+            self._count('documents', documents)
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+    def document(self, *args, **kwargs):
+        return InstrumentedDocument(self._target.document(*args, **kwargs), self._metrics)
+
+    def add(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self._target.add(*args, **kwargs)
+        self._count('writes', 1, time.perf_counter() - start)
+        return result
+
+
+class InstrumentedDocument(_Proxy):
+    def get(self, *args, **kwargs):
+        start = time.perf_counter()
+        snapshot = self._target.get(*args, **kwargs)
+        self._count('reads', 1, time.perf_counter() - start)
+        self._count('documents', 1 if snapshot.exists else 0)
+        return snapshot
+
+    def _write(self, name, *args, **kwargs):
+        start = time.perf_counter()
+        result = getattr(self._target, name)(*args, **kwargs)
+        self._count('writes', 1, time.perf_counter() - start)
+        return result
+
+    def set(self, *args, **kwargs):
+        return self._write('set', *args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._write('create', *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._write('update', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._write('delete', *args, **kwargs)
+
+    def collection(self, *args, **kwargs):
+        return InstrumentedQuery(self._target.collection(*args, **kwargs), self._metrics)
+
+
+class InstrumentedBatch(_Proxy):
+    # WriteBatch ou Transaction : écritures comptées à la validation
+    def __init__(self, target, metrics):
+        super().__init__(target, metrics)
+        self._pending = 0
+
+    def _queue(self, name, reference, *args, **kwargs):
+        self._pending += 1
+        return getattr(self._target, name)(_unwrap(reference), *args, **kwargs)
+
+    def set(self, reference, *args, **kwargs):
+        return self._queue('set', reference, *args, **kwargs)
+
+    def create(self, reference, *args, **kwargs):
+        return self._queue('create', reference, *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        return self._queue('update', reference, *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        return self._queue('delete', reference, *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self._target.commit(*args, **kwargs)
+        self._count('commits', 1, time.perf_counter() - start)
+        self._count('writes', self._pending)
+        self._pending = 0
+        return result
+
+    def _commit(self, *args, **kwargs):
+        # Validation d'une transaction par firestore.transactional
+        start = time.perf_counter()
+        result = self._target._commit(*args, **kwargs)
+        self._count('commits', 1, time.perf_counter() - start)
+        self._count('writes', self._pending)
+        self._pending = 0
+        return result
+
+    def _clean_up(self, *args, **kwargs):
+        # Nouvelle tentative d'une transaction : les écritures précédentes sont abandonnées
+        self._pending = 0
+        return self._target._clean_up(*args, **kwargs)
+
+    def _rollback(self, *args, **kwargs):
+        self._pending = 0
+        return self._target._rollback(*args, **kwargs)
+
+
+class InstrumentedClient(_Proxy):
+    # Enveloppe du client de base de données : chaque objet dérivé compte ses
+    # appels dans les mesures de la requête active au moment de sa création
+
+    def __init__(self, target):
+        super().__init__(target, None)
+
+    def collection(self, *args, **kwargs):
+        return InstrumentedQuery(self._target.collection(*args, **kwargs), current_request())
+
+    def document(self, *args, **kwargs):
+        return InstrumentedDocument(self._target.document(*args, **kwargs), current_request())
+
+    def batch(self, *args, **kwargs):
+        return InstrumentedBatch(self._target.batch(*args, **kwargs), current_request())
+
+    def transaction(self, *args, **kwargs):
+        return InstrumentedBatch(self._target.transaction(*args, **kwargs), current_request())
+
+    def get_all(self, references, *args, **kwargs):
+        metrics = current_request()
+        start = time.perf_counter()
+        documents = 0
+        try:
+            for snapshot in self._target.get_all([_unwrap(reference) for reference in references], *args, **kwargs):
+                documents += 1
+                yield snapshot
+        finally:
+            if metrics is not None:
+                metrics.count('reads', documents, time.perf_counter() - start)
+                metrics.count('documents', documents)
@@ -0,0 +1,72 @@
+# api/pagination.py
+
+from api.storage import ASCENDING, DESCENDING
+
+# Champs des sessions affichés dans les listes (sessions.html, attendance_sheet.html),
+# dont le résumé dénormalisé (nombre de candidats, heures, dates)
+SESSION_LIST_FIELDS = ['session_number', 'site', 'formation', 'annule', 'created_at', 'resume']
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(page_size, 1), MAX_PAGE_SIZE)
+
+
+def parse_annule(value):
+    # '1'/'true'/'oui' -> True, '0'/'false'/'non' -> False, sinon pas de filtre
+    if value is None or value == '':
+        return None
+    return str(value).lower() in ('1', 'true', 'oui')
+
+
+def fetch_sessions_page(db, order_by='created_at', descending=True, page_size=DEFAULT_PAGE_SIZE,
+                        after=None, site=None, formation=None, annule=None):
+    # Une page de sessions, bornée par page_size, en ne lisant que les colonnes
+    # affichées. `after` est l'identifiant de la dernière session de la page
+    # précédente ; renvoie (sessions, identifiant de curseur suivant ou None).
+    # Filtres et tri combinés : index composites de firestore.indexes.json.
+    query = db.collection('sessions')
+    if site:
+        query = query.where('site', '==', site)
+    if formation:
+        query = query.where('formation', '==', formation)
+    if annule is not None:
+        query = query.where('annule', '==', annule)
+
+    direction = DESCENDING if descending else ASCENDING
+    query = query.order_by(order_by, direction=direction).select(SESSION_LIST_FIELDS)
+
+    if after:
+        cursor = db.collection('sessions').document(after).get()
+        if cursor.exists:
+            query = query.start_after(cursor)
+
+    # Un document de plus que la taille de page indique s'il existe une page suivante
+    sessions = []
+    for doc in query.limit(page_size + 1).stream():
+        session = doc.to_dict()
+        session['id'] = doc.id
+        sessions.append(session)
+
+    next_cursor = None
+    if len(sessions) > page_size:
+        sessions = sessions[:page_size]
+        next_cursor = sessions[-1]['id']
+    return sessions, next_cursor
+
+
+def page_filters(args):
+    # Paramètres de pagination et de filtre communs aux routes de liste
+    return {
+        'page_size': parse_page_size(args.get('page_size')),
+        'after': args.get('after') or None,
+        'site': args.get('site') or None,
+        'formation': args.get('formation') or None,
+        'annule': parse_annule(args.get('annule')),
+    }
@@ -0,0 +1,70 @@
+# api/parallel_reads.py
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Lectures lancées simultanément, pour toute l'instance ; 1 : lectures
+# séquentielles (mesures, dépannage)
+READ_WORKERS = int(os.getenv('READ_WORKERS', '8'))
+
+_executor = None
+_executor_lock = threading.Lock()
+_worker = threading.local()
+
+
+def _get_executor():
+    # Pool créé à la première lecture parallèle puis partagé par toutes les
+    # requêtes : pas de threads créés et détruits à chaque appel
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix='lecture')
+    return _executor
+
+
+def configure(workers):
+    # Change le nombre de lectures simultanées (benchmarks.parallel_reads)
+    global READ_WORKERS, _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        READ_WORKERS = workers
+        _executor = None
+
+
+def _run(call):
+    _worker.active = True
+    try:
+        return call()
+    finally:
+        _worker.active = False
+
+
+def gather(*calls):
+    # Exécute les appels (fonctions sans argument) en parallèle et renvoie leurs
+    # résultats dans l'ordre ; la première exception est relancée. Chaque appel
+    # garde le contexte de la requête HTTP, pour que ses lectures soient
+    # comptées dans ses mesures (api/metrics.py). Un appel lancé depuis le pool
+    # s'exécute sur place : attendre le pool depuis le pool pourrait le bloquer.
+    if READ_WORKERS <= 1 or len(calls) <= 1 or getattr(_worker, 'active', False):
+        return [call() for call in calls]
+    executor = _get_executor()
+    futures = [executor.submit(contextvars.copy_context().run, _run, call) for call in calls]
+    return [future.result() for future in futures]
+
+
+def stream_documents(query):
+    # Documents d'une requête, avec leur identifiant
+    documents = []
+    for doc in query.stream():
+        data = doc.to_dict()
+        data['id'] = doc.id
+        documents.append(data)
+    return documents
+
+
+def stream_references(query):
+    return [doc.reference for doc in query.stream()]
@@ -0,0 +1,192 @@
+# api/pdf_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from api.generations import Generations
+
+# Incrémenter lorsque la mise en page du PDF change, pour ne plus servir les anciens fichiers
+PDF_LAYOUT_VERSION = 2
+
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'emargement_pdf_cache'))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# Seuls les champs imprimés sur la feuille entrent dans la clé
+SESSION_KEY_FIELDS = ('session_number', 'formation', 'site')
+PERIODE_KEY_FIELDS = ('date_debut', 'date_fin', 'heures', 'jours')
+CANDIDAT_KEY_FIELDS = ('nom', 'prenom')
+
+
+# Clé d'un PDF : empreinte SHA-256 en hexadécimal (attendance_pdf_key)
+PDF_KEY_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+def is_valid_pdf_key(key):
+    return isinstance(key, str) and PDF_KEY_PATTERN.fullmatch(key) is not None
+
+
+def is_valid_session_id(session_id):
+    # Identifiant utilisable comme nom de dossier : ni vide, ni '.' / '..', sans
+    # séparateur de chemin (règles des identifiants Firestore)
+    return (isinstance(session_id, str) and session_id not in ('', '.', '..')
+            and not any(char in session_id for char in ('/', '\\', '\0')))
+
+
+def _project(data, fields):
+    return [data.get(field) for field in fields]
+
+
+def attendance_pdf_key(session_id, session_data, periodes, candidats, signatures=None):
+    # Empreinte du contenu de la feuille : sert de nom de fichier et d'ETag ;
+    # signatures : empreinte des signatures numériques tracées, le cas échéant
+    payload = {
+        'version': PDF_LAYOUT_VERSION,
+        'session_id': session_id,
+        'session': _project(session_data, SESSION_KEY_FIELDS),
+        'periodes': [_project(periode, PERIODE_KEY_FIELDS) for periode in periodes],
+        'candidats': [_project(candidat, CANDIDAT_KEY_FIELDS) for candidat in candidats],
+    }
+    if signatures is not None:
+        payload['signatures'] = signatures
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class LocalDiskPdfStore:
+    # Fichiers rangés par session (<dossier>/<session_id>/<clé>.pdf) pour pouvoir
+    # invalider une session d'un coup. Chaque lecture remet à jour la date du
+    # fichier : l'éviction supprime les moins récemment utilisés dès que la
+    # taille totale dépasse max_bytes. La taille est tenue à jour à chaque
+    # écriture ; le dossier n'est parcouru qu'au premier ajout puis lorsque
+    # le budget est dépassé (les ajouts d'autres processus sont alors recomptés).
+
+    def __init__(self, directory=PDF_CACHE_DIR, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None  # Octets en cache, inconnu avant le premier parcours
+        self._lock = threading.Lock()
+        # Génération de chaque session, changée par invalidate_session ;
+        # l'écriture d'un PDF et l'invalidation de sa session s'excluent
+        self._generations = Generations()
+        self._write_lock = threading.Lock()
+
+    def _session_dir(self, session_id):
+        # Jamais de chemin hors du dossier du cache, quelle que soit l'entrée
+        if not is_valid_session_id(session_id):
+            raise ValueError(f"Identifiant de session invalide : {session_id!r}")
+        return os.path.join(self.directory, session_id)
+
+    def _path(self, session_id, key):
+        if not is_valid_pdf_key(key):
+            raise ValueError(f"Clé de PDF invalide : {key!r}")
+        return os.path.join(self._session_dir(session_id), f"{key}.pdf")
+
+    def get(self, session_id, key):
+        path = self._path(session_id, key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def generation(self, session_id):
+        # À relever avant de lire les données d'une feuille, pour put()
+        return self._generations.get(session_id)
+
+    def put(self, session_id, key, fileobj, generation=None):
+        # Range le PDF et renvoie son chemin. Avec generation (relevée avant de
+        # lire les données), renvoie None sans rien garder si la session a été
+        # invalidée depuis : le PDF a été construit sur des données périmées.
+        session_dir = self._session_dir(session_id)
+        path = self._path(session_id, key)
+        os.makedirs(session_dir, exist_ok=True)
+        # Écriture dans un fichier temporaire puis renommage atomique
+        fd, tmp_path = tempfile.mkstemp(dir=session_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            shutil.copyfileobj(fileobj, tmp)
+            size = tmp.tell()
+        with self._write_lock:
+            stale = generation is not None and generation != self._generations.get(session_id)
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            try:
+                if stale:
+                    os.remove(tmp_path)
+                else:
+                    os.replace(tmp_path, path)
+            except FileNotFoundError:
+                # Dossier supprimé par une invalidation pendant l'écriture
+                stale = True
+        if stale:
+            return None
+        with self._lock:
+            if self._size is not None:
+                self._size += size - replaced
+            over_budget = self._size is None or self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+        return path
+
+    def invalidate_session(self, session_id):
+        session_dir = self._session_dir(session_id)
+        removed = 0
+        with self._write_lock:
+            self._generations.bump(session_id)
+            try:
+                with os.scandir(session_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith('.pdf'):
+                            removed += entry.stat().st_size
+            except FileNotFoundError:
+                return
+            shutil.rmtree(session_dir, ignore_errors=True)
+        with self._lock:
+            if self._size is not None:
+                self._size = max(0, self._size - removed)
+
+    def evict(self):
+        # Parcourt le dossier, supprime les fichiers les plus anciens au-delà de
+        # max_bytes et recale la taille suivie sur la taille réelle
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            logging.debug("PDF évincé du cache : %s.", path)
+        with self._lock:
+            self._size = total
+
+
+pdf_store = LocalDiskPdfStore()
+
+
+def invalidate_session(session_id):
+    # Appelé par chaque route qui modifie une session ou ses candidats
+    try:
+        pdf_store.invalidate_session(session_id)
+    except (OSError, ValueError) as e:
+        logging.warning("Invalidation du cache PDF impossible pour %s : %s", session_id, e)
@@ -0,0 +1,93 @@
+# api/session_cache.py
+
+import copy
+import os
+import threading
+
+from cachetools import TTLCache
+
+from api.generations import Generations
+from api.parallel_reads import gather, stream_documents
+from api.session_summary import CANDIDATS_FIELD, PERIODES_FIELD, has_summary
+
+# Durée de vie (secondes) et nombre maximal de sessions gardées en mémoire
+SESSION_CACHE_TTL = int(os.getenv('SESSION_CACHE_TTL', '60'))
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', '256'))
+
+
+def load_session_aggregate(db, session_id):
+    # Session, candidats et périodes ; renvoie None si la session n'existe pas.
+    # Une seule lecture lorsque la session porte ses champs dénormalisés, sinon
+    # les deux requêtes sur les collections sont lancées en parallèle.
+    session = db.collection('sessions').document(session_id).get()
+    if not session.exists:
+        return None
+    session_data = session.to_dict()
+    session_data['id'] = session.id
+
+    if has_summary(session_data):
+        candidats = [dict(c, session_id=session_id) for c in session_data[CANDIDATS_FIELD]]
+        periodes = [dict(p, session_id=session_id) for p in session_data[PERIODES_FIELD]]
+    else:
+        candidats, periodes = gather(
+            lambda: stream_documents(db.collection('candidats').where('session_id', '==', session_id)),
+            lambda: stream_documents(db.collection('periodes').where('session_id', '==', session_id)))
+    return {'session': session_data, 'candidats': candidats, 'periodes': periodes}
+
+
+class SessionAggregateCache:
+    # Cache en lecture traversante des agrégats de session, borné en taille (LRU)
+    # et en durée (TTL). Propre à chaque processus : les routes qui modifient une
+    # session doivent l'invalider, les autres instances la verront au plus tard
+    # à l'expiration du TTL. Chaque invalidation change la génération de la
+    # session : un agrégat lu avant une invalidation n'est pas mis en cache.
+
+    def __init__(self, maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generations = Generations()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db, session_id):
+        with self._lock:
+            aggregate = self._cache.get(session_id)
+            if aggregate is not None:
+                self.hits += 1
+            generation = self._generations.get(session_id)
+        if aggregate is None:
+            aggregate = load_session_aggregate(db, session_id)
+            with self._lock:
+                self.misses += 1
+                # Session modifiée pendant la lecture : l'agrégat est servi tel
+                # quel mais pas gardé
+                unchanged = generation == self._generations.get(session_id)
+                if aggregate is not None and unchanged:
+                    self._cache[session_id] = aggregate
+        # Copie : les appelants peuvent modifier le résultat sans altérer le cache
+        return copy.deepcopy(aggregate)
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._generations.bump(session_id)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._generations.bump_all()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': len(self._cache),
+                'maxsize': self._cache.maxsize,
+                'ttl': self._cache.ttl,
+            }
+
+
+session_cache = SessionAggregateCache()
@@ -0,0 +1,158 @@
+# api/session_summary.py
+
+from api.candidate_search import with_search_tokens
+from api.storage import run_transaction
+from api.work_calendar import DATE_FORMAT, DEBUT_FIELD, FIN_FIELD, JOURS_FIELD, as_datetime, periode_bounds
+
+# Champs dénormalisés portés par chaque document de session :
+#   resume          : compteurs et plage de dates (texte et natives, cette
+#                     dernière pour les requêtes par date), lus par la liste des sessions
+#   liste_candidats : [{id, nom, prenom}], lu par le détail et la feuille d'émargement
+#   liste_periodes  : [{id, date_debut, date_fin, heures, debut, fin, jours}]
+# Les collections candidats et periodes restent la référence ; ces champs sont
+# réécrits dans la même transaction que chaque modification.
+SUMMARY_FIELD = 'resume'
+CANDIDATS_FIELD = 'liste_candidats'
+PERIODES_FIELD = 'liste_periodes'
+
+# Firestore accepte 500 écritures par transaction, dont une pour la session
+MAX_CANDIDATES_PER_TRANSACTION = 499
+
+
+def candidat_entry(candidate_id, data):
+    return {'id': candidate_id, 'nom': data.get('nom', ''), 'prenom': data.get('prenom', '')}
+
+
+def periode_entry(periode_id, data):
+    entry = {'id': periode_id, 'date_debut': data.get('date_debut', ''),
+             'date_fin': data.get('date_fin', ''), 'heures': data.get('heures', 0)}
+    # Calendrier précalculé, absent des périodes antérieures à init_periode_calendar.py
+    for field in (DEBUT_FIELD, FIN_FIELD, JOURS_FIELD):
+        if field in data:
+            entry[field] = data[field]
+    return entry
+
+
+def _bounds(periode):
+    try:
+        return periode_bounds(periode)
+    except ValueError:
+        return None
+
+
+def compute_summary(candidats, periodes):
+    bounds = [b for b in (_bounds(p) for p in periodes) if b]
+    debut = min(b[0] for b in bounds) if bounds else None
+    fin = max(b[1] for b in bounds) if bounds else None
+    return {
+        'nb_candidats': len(candidats),
+        'nb_periodes': len(periodes),
+        'total_heures': sum(p.get('heures') or 0 for p in periodes),
+        'date_debut': debut.strftime(DATE_FORMAT) if debut else None,
+        'date_fin': fin.strftime(DATE_FORMAT) if fin else None,
+        DEBUT_FIELD: as_datetime(debut) if debut else None,
+        FIN_FIELD: as_datetime(fin) if fin else None,
+    }
+
+
+def summary_fields(candidats, periodes):
+    # Champs à écrire sur le document de session
+    return {
+        SUMMARY_FIELD: compute_summary(candidats, periodes),
+        CANDIDATS_FIELD: candidats,
+        PERIODES_FIELD: periodes,
+    }
+
+
+def has_summary(session_data):
+    return all(field in session_data for field in (SUMMARY_FIELD, CANDIDATS_FIELD, PERIODES_FIELD))
+
+
+def _child_entries(db, collection, session_id, entry):
+    return [entry(doc.id, doc.to_dict()) for doc in db.collection(collection).where('session_id', '==', session_id).stream()]
+
+
+def load_entries(db, session_id, session_data):
+    # Candidats et périodes de la session : champs dénormalisés si présents,
+    # sinon (session pas encore reprise par init_session_summaries.py) requêtes
+    # sur les collections
+    if has_summary(session_data):
+        return session_data[CANDIDATS_FIELD], session_data[PERIODES_FIELD]
+    return (_child_entries(db, 'candidats', session_id, candidat_entry),
+            _child_entries(db, 'periodes', session_id, periode_entry))
+
+
+def _change_candidates(transaction, db, session_ref, new_candidates, removed_ids, linked=()):
+    snapshot = session_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    candidats, periodes = load_entries(db, session_ref.id, snapshot.to_dict())
+
+    removed = set(removed_ids)
+    candidats = [c for c in candidats if c['id'] not in removed]
+    for candidate_id in removed_ids:
+        transaction.delete(db.collection('candidats').document(candidate_id))
+    for reference in linked:
+        transaction.delete(reference)
+
+    references = []
+    for data in new_candidates:
+        reference = db.collection('candidats').document()
+        transaction.set(reference, with_search_tokens(data))
+        candidats.append(candidat_entry(reference.id, data))
+        references.append(reference)
+
+    transaction.update(session_ref, summary_fields(candidats, periodes))
+    return references
+
+
+def add_candidates(db, session_id, candidates):
+    # Crée les candidats et met à jour le résumé de la session, atomiquement par
+    # paquets de MAX_CANDIDATES_PER_TRANSACTION ; renvoie les références créées
+    # (None si la session n'existe pas)
+    session_ref = db.collection('sessions').document(session_id)
+    candidates = list(candidates)
+    references = []
+    for start in range(0, len(candidates), MAX_CANDIDATES_PER_TRANSACTION):
+        chunk = candidates[start:start + MAX_CANDIDATES_PER_TRANSACTION]
+        created = run_transaction(db, _change_candidates, db, session_ref, chunk, ())
+        if created is None:
+            return None
+        references.extend(created)
+    return references
+
+
+def remove_candidate(db, session_id, candidate_id, linked=()):
+    # Supprime le candidat et les documents liés (ses signatures) et le retire
+    # du résumé de sa session dans la même transaction ; linked compte au plus
+    # MAX_CANDIDATES_PER_TRANSACTION - 1 références
+    session_ref = db.collection('sessions').document(session_id)
+    return run_transaction(db, _change_candidates, db, session_ref, (), (candidate_id,), linked) is not None
+
+
+def _refresh_in_transaction(transaction, db, session_ref):
+    snapshot = session_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return False
+    candidats = _child_entries(db, 'candidats', session_ref.id, candidat_entry)
+    periodes = _child_entries(db, 'periodes', session_ref.id, periode_entry)
+    transaction.update(session_ref, summary_fields(candidats, periodes))
+    return True
+
+
+def refresh_session_summary(db, session_id):
+    # Recalcule les champs dénormalisés à partir des collections candidats et periodes
+    return run_transaction(db, _refresh_in_transaction, db, db.collection('sessions').document(session_id))
+
+
+def backfill_session_summaries(db, force=False):
+    # Renseigne les champs dénormalisés des sessions qui ne les ont pas encore
+    # (toutes si force) ; renvoie (sessions parcourues, sessions mises à jour)
+    seen = updated = 0
+    for doc in db.collection('sessions').select([SUMMARY_FIELD]).stream():
+        seen += 1
+        if not force and SUMMARY_FIELD in doc.to_dict():
+            continue
+        if refresh_session_summary(db, doc.id):
+            updated += 1
+    return seen, updated
@@ -0,0 +1,198 @@
+# api/signatures.py
+
+import hashlib
+import json
+import os
+import sys
+import zlib
+from array import array
+from datetime import datetime, timezone
+
+from api.batching import BatchWriter
+from api.storage import server_timestamp
+from api.work_calendar import periode_days
+
+# Créneaux d'une journée, colonnes "Matin" et "Après-midi" de la feuille
+SLOTS = ('matin', 'apres_midi')
+
+# Repère des tracés envoyés par le navigateur : entiers de 0 à WIDTH (gauche à
+# droite) et de 0 à HEIGHT (haut en bas), quelle que soit la taille de l'écran
+SIGNATURE_WIDTH = 1000
+SIGNATURE_HEIGHT = 400
+
+# Limites par signature et par envoi
+SIGNATURE_MAX_POINTS = 4000
+SIGNATURE_MAX_STROKES = 100
+SIGNATURE_SYNC_MAX_ITEMS = int(os.getenv('SIGNATURE_SYNC_MAX_ITEMS', '500'))
+# Taille maximale d'un envoi une fois décompressé
+SIGNATURE_SYNC_MAX_BYTES = 8 * 1024 * 1024
+
+
+class SignatureError(ValueError):
+    pass
+
+
+def encode_strokes(strokes):
+    # Tracés [[x0, y0, x1, y1, ...], ...] -> octets compressés : pour chaque
+    # tracé, son nombre de points puis les écarts avec le point précédent
+    # (entiers 16 bits petit-boutistes), le tout passé à zlib
+    if not isinstance(strokes, list) or not strokes:
+        raise SignatureError("Signature vide.")
+    if len(strokes) > SIGNATURE_MAX_STROKES:
+        raise SignatureError("Signature trop complexe.")
+    values = array('h')
+    points = 0
+    last_x = last_y = 0
+    for stroke in strokes:
+        if not isinstance(stroke, list) or len(stroke) < 2 or len(stroke) % 2:
+            raise SignatureError("Tracé mal formé.")
+        points += len(stroke) // 2
+        if points > SIGNATURE_MAX_POINTS:
+            raise SignatureError("Signature trop complexe.")
+        values.append(len(stroke) // 2)
+        for i in range(0, len(stroke), 2):
+            x, y = stroke[i], stroke[i + 1]
+            if not (isinstance(x, int) and isinstance(y, int)
+                    and 0 <= x <= SIGNATURE_WIDTH and 0 <= y <= SIGNATURE_HEIGHT):
+                raise SignatureError("Point hors du cadre de signature.")
+            values.extend((x - last_x, y - last_y))
+            last_x, last_y = x, y
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return zlib.compress(values.tobytes(), 9)
+
+
+def decode_strokes(data):
+    # Inverse de encode_strokes : liste de tracés, chacun liste de (x, y)
+    values = array('h')
+    values.frombytes(zlib.decompress(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    strokes = []
+    x = y = i = 0
+    while i < len(values):
+        count = values[i]
+        i += 1
+        stroke = []
+        for _ in range(count):
+            x += values[i]
+            y += values[i + 1]
+            i += 2
+            stroke.append((x, y))
+        strokes.append(stroke)
+    return strokes
+
+
+def read_sync_payload(body, content_encoding=None):
+    # Corps d'un envoi : {"signatures": [...]} en JSON, compressé en gzip par
+    # les navigateurs qui le permettent ; renvoie la liste des signatures
+    if content_encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, SIGNATURE_SYNC_MAX_BYTES)
+        except zlib.error:
+            raise SignatureError("Envoi compressé illisible.")
+        if decompressor.unconsumed_tail:
+            raise SignatureError("Envoi trop volumineux.")
+    elif content_encoding not in (None, '', 'identity'):
+        raise SignatureError(f"Encodage non pris en charge : {content_encoding}.")
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, ValueError):
+        raise SignatureError("Envoi mal formé (JSON attendu).")
+    items = payload.get('signatures') if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        raise SignatureError("Envoi mal formé : liste 'signatures' attendue.")
+    return items
+
+
+def signature_id(periode_id, candidat_id, jour, creneau):
+    # Identifiant déterministe : un envoi rejoué après une coupure réécrit le
+    # même document au lieu d'en créer un second
+    return f"{periode_id}_{candidat_id}_{jour.replace('/', '')}_{creneau}"
+
+
+def _signed_at(value):
+    # Heure de signature sur l'appareil (millisecondes epoch), sinon None
+    if isinstance(value, (int, float)) and value > 0:
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    return None
+
+
+def save_signatures(db, session_id, aggregate, items):
+    # Enregistre un lot de signatures de la session : chacune est vérifiée
+    # contre la session (période, candidat, jour ouvré, créneau), puis toutes
+    # sont écrites par lots, sans lecture préalable. Renvoie (nombre
+    # d'enregistrées, [{index, message}] pour les signatures refusées).
+    if len(items) > SIGNATURE_SYNC_MAX_ITEMS:
+        raise SignatureError(f"Trop de signatures dans un même envoi (maximum {SIGNATURE_SYNC_MAX_ITEMS}).")
+    periodes = {p['id']: set(periode_days(p)) for p in aggregate['periodes']}
+    candidats = {c['id'] for c in aggregate['candidats']}
+
+    errors = []
+    saved = 0
+    with BatchWriter(db) as batch:
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise SignatureError("Signature mal formée.")
+                periode_id, candidat_id = item.get('p'), item.get('c')
+                jour, creneau = item.get('j'), item.get('s')
+                if periode_id not in periodes:
+                    raise SignatureError("Période inconnue.")
+                if candidat_id not in candidats:
+                    raise SignatureError("Candidat inconnu.")
+                if jour not in periodes[periode_id]:
+                    raise SignatureError("Ce jour n'est pas un jour ouvré de la période.")
+                if creneau not in SLOTS:
+                    raise SignatureError("Créneau inconnu.")
+                traits = encode_strokes(item.get('t'))
+            except SignatureError as e:
+                errors.append({'index': index, 'message': str(e)})
+                continue
+            batch.set(db.collection('signatures').document(signature_id(periode_id, candidat_id, jour, creneau)), {
+                'session_id': session_id,
+                'periode_id': periode_id,
+                'candidat_id': candidat_id,
+                'jour': jour,
+                'creneau': creneau,
+                'traits': traits,
+                'signe_le': _signed_at(item.get('at')),
+                'recu_le': server_timestamp(),
+            })
+            saved += 1
+    return saved, errors
+
+
+def load_signatures(db, session_id):
+    # Signatures de la session, une requête : {(periode_id, candidat_id): {(jour, créneau): traits}}
+    signatures = {}
+    query = db.collection('signatures').where('session_id', '==', session_id)\
+                                       .select(['periode_id', 'candidat_id', 'jour', 'creneau', 'traits'])
+    for doc in query.stream():
+        data = doc.to_dict()
+        page = signatures.setdefault((data['periode_id'], data['candidat_id']), {})
+        page[(data['jour'], data['creneau'])] = data['traits']
+    return signatures
+
+
+def signed_slots(db, session_id):
+    # Créneaux déjà signés, sans lire les tracés : [[periode_id, candidat_id, jour, créneau], ...]
+    query = db.collection('signatures').where('session_id', '==', session_id)\
+                                       .select(['periode_id', 'candidat_id', 'jour', 'creneau'])
+    return sorted([data['periode_id'], data['candidat_id'], data['jour'], data['creneau']]
+                  for data in (doc.to_dict() for doc in query.stream()))
+
+
+def signatures_digest(signatures, periodes, candidats):
+    # Empreinte des signatures imprimées sur une feuille, pour la clé du cache PDF
+    periode_ids = {p['id'] for p in periodes}
+    candidat_ids = {c['id'] for c in candidats}
+    digest = hashlib.sha256()
+    for (periode_id, candidat_id), page in sorted(signatures.items()):
+        if periode_id not in periode_ids or candidat_id not in candidat_ids:
+            continue
+        for slot, traits in sorted(page.items()):
+            digest.update(f"{periode_id}|{candidat_id}|{slot[0]}|{slot[1]}|".encode('utf-8'))
+            digest.update(hashlib.sha256(traits).digest())
+    return digest.hexdigest()
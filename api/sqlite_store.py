@@ -0,0 +1,447 @@
+# api/sqlite_store.py
+
+# Moteur de stockage local : implémente, au-dessus de SQLite, le sous-ensemble
+# de l'API google.cloud.firestore.Client utilisé par l'application, pour que
+# les routes et les modules fonctionnent sans réseau et sans modification.
+# Les documents sont stockés en JSON dans une seule table, avec des index sur
+# les champs interrogés (session_id, created_at, session_number, resume.fin).
+
+import base64
+import json
+import re
+import secrets
+import sqlite3
+import string
+import threading
+from datetime import date, datetime, timezone
+
+from google.api_core import exceptions
+from google.cloud import firestore
+from google.cloud.firestore_v1.transforms import Sentinel, Increment
+
+# Préfixes (zone à usage privé d'Unicode) marquant les dates encodées en texte ISO :
+# l'ordre lexicographique reste l'ordre chronologique
+_DATETIME_PREFIX = '\ue000'
+_DATE_PREFIX = '\ue001'
+# Même principe pour les champs binaires (bytes), encodés en base64
+_BYTES_PREFIX = '\ue002'
+
+_FIELD_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+# Champs indexés : l'expression doit être identique dans l'index et dans les requêtes
+INDEXED_FIELDS = ('session_id', 'created_at', 'session_number', 'resume.fin')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+)
+"""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return _DATETIME_PREFIX + value.astimezone(timezone.utc).isoformat(timespec='microseconds')
+    if isinstance(value, date):
+        return _DATE_PREFIX + value.isoformat()
+    if isinstance(value, bytes):
+        return _BYTES_PREFIX + base64.b64encode(value).decode('ascii')
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, str):
+        if value.startswith(_DATETIME_PREFIX):
+            return datetime.fromisoformat(value[1:])
+        if value.startswith(_DATE_PREFIX):
+            return date.fromisoformat(value[1:])
+        if value.startswith(_BYTES_PREFIX):
+            return base64.b64decode(value[1:])
+        return value
+    if isinstance(value, dict):
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _field_expr(field):
+    if field == '__name__':
+        return 'id'
+    if not _FIELD_RE.match(field):
+        raise ValueError(f"Chemin de champ non pris en charge : {field!r}")
+    return f"json_extract(data, '$.{field}')"
+
+
+def _bind(value):
+    value = _encode(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _new_id():
+    return ''.join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+
+class SQLiteSnapshot:
+    def __init__(self, reference, data, fields=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self._fields = fields
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        data = _decode(json.loads(self._data))
+        if self._fields is not None:
+            data = {key: value for key, value in data.items() if key in self._fields}
+        return data
+
+    def get(self, field):
+        value = self.to_dict()
+        for part in field.split('.'):
+            value = value[part]
+        return value
+
+
+class SQLiteDocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self, field_paths=None, transaction=None):
+        data = self._client._read(self._collection, self.id)
+        return SQLiteSnapshot(self, data, field_paths)
+
+    def set(self, document_data, merge=False):
+        with self._client._write() as conn:
+            self._client._apply_set(conn, self, document_data, merge)
+
+    def update(self, field_updates):
+        with self._client._write() as conn:
+            self._client._apply_update(conn, self, field_updates)
+
+    def delete(self):
+        with self._client._write() as conn:
+            self._client._apply_delete(conn, self)
+
+
+class SQLiteQuery:
+    def __init__(self, client, collection, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                     cursor=self._cursor, fields=self._fields)
+        state.update(changes)
+        return SQLiteQuery(self._client, self._collection, **state)
+
+    def where(self, field_path, op_string, value):
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=firestore.Query.ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def select(self, field_paths):
+        return self._copy(fields=tuple(field_paths))
+
+    def _filter_sql(self, field, op, value):
+        expr = _field_expr(field)
+        if op == '==':
+            return (f"{expr} IS NULL", []) if value is None else (f"{expr} = ?", [_bind(value)])
+        if op in ('<', '<=', '>', '>='):
+            return f"{expr} {op} ?", [_bind(value)]
+        if op == '!=':
+            return f"{expr} IS NOT NULL AND {expr} != ?", [_bind(value)]
+        if op in ('in', 'not-in'):
+            values = [_bind(item) for item in value]
+            placeholders = ', '.join('?' for _ in values) or 'NULL'
+            negation = 'NOT ' if op == 'not-in' else ''
+            return f"{expr} {negation}IN ({placeholders})", values
+        if op in ('array_contains', 'array_contains_any'):
+            values = [_bind(item) for item in (value if op == 'array_contains_any' else [value])]
+            placeholders = ', '.join('?' for _ in values) or 'NULL'
+            path = expr[len("json_extract(data, "):-1]
+            return (f"EXISTS (SELECT 1 FROM json_each(data, {path}) WHERE json_each.value IN ({placeholders}))",
+                    values)
+        raise ValueError(f"Opérateur non pris en charge : {op!r}")
+
+    def _order_terms(self):
+        # Départage implicite sur l'identifiant, dans le sens du dernier tri (comme Firestore)
+        last = self._orders[-1][1] if self._orders else firestore.Query.ASCENDING
+        return [(_field_expr(field), direction) for field, direction in self._orders] + [('id', last)]
+
+    def _cursor_sql(self, terms):
+        if isinstance(self._cursor, SQLiteSnapshot):
+            data = self._cursor.to_dict() or {}
+            values = [_bind(data.get(field)) for field, _ in self._orders] + [self._cursor.id]
+        else:
+            values = [_bind(self._cursor.get(field)) for field, _ in self._orders]
+            terms = terms[:len(values)]
+        # (a, b, id) > (va, vb, vid), chaque terme dans son propre sens de tri
+        clauses, params = [], []
+        for index, (expr, direction) in enumerate(terms):
+            op = '<' if direction == firestore.Query.DESCENDING else '>'
+            parts = [f"{terms[i][0]} = ?" for i in range(index)] + [f"{expr} {op} ?"]
+            clauses.append('(' + ' AND '.join(parts) + ')')
+            params.extend(values[:index + 1])
+        return '(' + ' OR '.join(clauses) + ')', params
+
+    def _sql(self):
+        conditions, params = ['collection = ?'], [self._collection]
+        for field, op, value in self._filters:
+            condition, values = self._filter_sql(field, op, value)
+            conditions.append(condition)
+            params.extend(values)
+        # Comme Firestore, un tri exclut les documents sans le champ trié
+        for field, _ in self._orders:
+            conditions.append(f"{_field_expr(field)} IS NOT NULL")
+        terms = self._order_terms()
+        if self._cursor is not None:
+            condition, values = self._cursor_sql(terms)
+            conditions.append(condition)
+            params.extend(values)
+        order = ', '.join(f"{expr} {'DESC' if direction == firestore.Query.DESCENDING else 'ASC'}"
+                          for expr, direction in terms)
+        sql = f"SELECT id, data FROM documents WHERE {' AND '.join(conditions)} ORDER BY {order}"
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        return sql, params
+
+    def stream(self, transaction=None):
+        sql, params = self._sql()
+        for doc_id, data in self._client._query(sql, params):
+            reference = SQLiteDocumentReference(self._client, self._collection, doc_id)
+            yield SQLiteSnapshot(reference, data, self._fields)
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+
+class SQLiteCollectionReference(SQLiteQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, document_id=None):
+        return SQLiteDocumentReference(self._client, self._collection, document_id or _new_id())
+
+    def add(self, document_data):
+        reference = self.document()
+        reference.set(document_data)
+        return None, reference
+
+
+class SQLiteWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, document_data, merge=False):
+        self._ops.append(('set', reference, document_data, merge))
+
+    def update(self, reference, field_updates):
+        self._ops.append(('update', reference, field_updates, None))
+
+    def delete(self, reference):
+        self._ops.append(('delete', reference, None, None))
+
+    def __len__(self):
+        return len(self._ops)
+
+    def _apply(self, conn):
+        for op, reference, data, merge in self._ops:
+            if op == 'set':
+                self._client._apply_set(conn, reference, data, merge)
+            elif op == 'update':
+                self._client._apply_update(conn, reference, data)
+            else:
+                self._client._apply_delete(conn, reference)
+
+    def commit(self):
+        with self._client._write() as conn:
+            self._apply(conn)
+        ops, self._ops = self._ops, []
+        return ops
+
+
+class SQLiteTransaction(SQLiteWriteBatch):
+    # Interface attendue par firestore.transactional. La transaction garde le
+    # verrou du client (et un verrou d'écriture SQLite) de _begin à _commit : les
+    # lectures qu'elle effectue ne peuvent pas être modifiées entre-temps.
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._id = None
+
+    def _clean_up(self):
+        self._ops = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._client._lock.acquire()
+        try:
+            self._client._conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self._client._lock.release()
+            raise
+        self._id = secrets.token_bytes(8)
+
+    def _commit(self):
+        try:
+            self._apply(self._client._conn)
+            self._client._conn.execute("COMMIT")
+        except Exception:
+            self._client._conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._clean_up()
+            self._client._lock.release()
+
+    def _rollback(self):
+        if self._id is not None:
+            self._client._conn.execute("ROLLBACK")
+            self._clean_up()
+            self._client._lock.release()
+
+
+class _WriteContext:
+    def __init__(self, client):
+        self._client = client
+
+    def __enter__(self):
+        self._client._lock.acquire()
+        self._nested = self._client._conn.in_transaction
+        if not self._nested:
+            self._client._conn.execute("BEGIN IMMEDIATE")
+        return self._client._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if not self._nested:
+                self._client._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._client._lock.release()
+        return False
+
+
+class SQLiteClient:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        # Une seule connexion partagée, protégée par le verrou ; le mode WAL
+        # permet à d'autres processus de lire pendant une écriture
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        for field in INDEXED_FIELDS:
+            # L'identifiant en dernière colonne couvre aussi le départage du tri
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{field.replace('.', '_')} "
+                               f"ON documents (collection, {_field_expr(field)}, id)")
+
+    def _write(self):
+        return _WriteContext(self)
+
+    def _query(self, sql, params):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _read(self, collection, doc_id):
+        rows = self._query("SELECT data FROM documents WHERE collection = ? AND id = ?", [collection, doc_id])
+        return rows[0][0] if rows else None
+
+    def _resolve(self, current, data):
+        resolved = dict(current or {})
+        for key, value in data.items():
+            if isinstance(value, Sentinel) and value is firestore.SERVER_TIMESTAMP:
+                value = datetime.now(timezone.utc)
+            elif isinstance(value, Sentinel) and value is firestore.DELETE_FIELD:
+                resolved.pop(key, None)
+                continue
+            elif isinstance(value, Increment):
+                value = (resolved.get(key) or 0) + value.value
+            resolved[key] = value
+        return resolved
+
+    def _current(self, conn, reference):
+        row = conn.execute("SELECT data FROM documents WHERE collection = ? AND id = ?",
+                           [reference._collection, reference.id]).fetchone()
+        return _decode(json.loads(row[0])) if row else None
+
+    def _store(self, conn, reference, data):
+        conn.execute("INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                     [reference._collection, reference.id, json.dumps(_encode(data), ensure_ascii=False)])
+
+    def _apply_set(self, conn, reference, data, merge):
+        current = self._current(conn, reference) if merge else None
+        self._store(conn, reference, self._resolve(current, data))
+
+    def _apply_update(self, conn, reference, data):
+        current = self._current(conn, reference)
+        if current is None:
+            raise exceptions.NotFound(f"Document introuvable : {reference.path}")
+        self._store(conn, reference, self._resolve(current, data))
+
+    def _apply_delete(self, conn, reference):
+        conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", [reference._collection, reference.id])
+
+    def collection(self, collection_path):
+        return SQLiteCollectionReference(self, collection_path)
+
+    def batch(self):
+        return SQLiteWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return SQLiteTransaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        found = {}
+        for collection in {reference._collection for reference in references}:
+            ids = [reference.id for reference in references if reference._collection == collection]
+            placeholders = ', '.join('?' for _ in ids)
+            rows = self._query(f"SELECT id, data FROM documents WHERE collection = ? AND id IN ({placeholders})",
+                               [collection] + ids)
+            found.update({(collection, doc_id): data for doc_id, data in rows})
+        for reference in references:
+            yield SQLiteSnapshot(reference, found.get((reference._collection, reference.id)), field_paths)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,117 @@
+# api/storage.py
+
+import os
+import json
+import base64
+import logging
+import threading
+
+# Sens de tri, mêmes valeurs que firestore.Query.ASCENDING/DESCENDING : évite
+# d'importer le SDK Firestore pour construire une requête
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+# Moteur de stockage : 'firestore' (par défaut) ou 'sqlite' (hors ligne / sur site)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firestore')
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'emargement_store.db'))
+
+
+def create_firestore_client():
+    from google.cloud import firestore
+    from google.oauth2 import service_account
+
+    # Décoder la clé du compte de service
+    firebase_service_account_b64 = os.getenv('FIREBASE_SERVICE_ACCOUNT')
+    if not firebase_service_account_b64:
+        raise ValueError("La variable d'environnement FIREBASE_SERVICE_ACCOUNT n'est pas définie.")
+
+    try:
+        service_account_info = json.loads(base64.b64decode(firebase_service_account_b64))
+    except Exception as e:
+        raise ValueError(f"Erreur lors du décodage de FIREBASE_SERVICE_ACCOUNT : {e}")
+
+    # Initialiser Firestore avec les credentials appropriés
+    return firestore.Client(credentials=service_account.Credentials.from_service_account_info(service_account_info))
+
+
+def create_sqlite_client(path=SQLITE_PATH):
+    from api.sqlite_store import SQLiteClient
+    return SQLiteClient(path)
+
+
+def create_database(backend=None):
+    # Client de base de données exposant l'API google.cloud.firestore.Client
+    backend = backend or STORAGE_BACKEND
+    if backend == 'firestore':
+        return create_firestore_client()
+    if backend == 'sqlite':
+        return create_sqlite_client()
+    raise ValueError(f"Moteur de stockage inconnu : {backend!r} (attendu : 'firestore' ou 'sqlite').")
+
+
+def server_timestamp():
+    # Sentinelle firestore.SERVER_TIMESTAMP, importée seulement au moment d'écrire
+    from google.cloud import firestore
+    return firestore.SERVER_TIMESTAMP
+
+
+def run_transaction(db, function, *args):
+    # Exécute function(transaction, *args) dans une transaction, relancée en cas de conflit
+    from google.cloud import firestore
+    return firestore.transactional(function)(db.transaction(), *args)
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def _instrumented(client):
+    # Comptage des lectures et écritures par requête (voir api/metrics.py)
+    from api.metrics import METRICS_SAMPLE_RATE, InstrumentedClient
+    return InstrumentedClient(client) if METRICS_SAMPLE_RATE > 0 else client
+
+
+def get_database():
+    # Client créé à la première utilisation puis réutilisé par toutes les requêtes
+    # de l'instance : un démarrage à froid qui ne sert qu'une page statique ne
+    # charge ni le SDK Firestore ni les identifiants
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = _instrumented(create_database())
+    return _database
+
+
+def set_database(client):
+    # Remplace le client (substitut en mémoire pour les mesures, par exemple)
+    global _database
+    with _database_lock:
+        _database = _instrumented(client)
+
+
+def warm_database():
+    # Crée le client et ouvre son canal gRPC par une lecture légère, pour que la
+    # première requête servie ne paie ni le chargement du SDK ni la connexion
+    try:
+        get_database().collection('counters').document('sessions').get()
+    except Exception as e:
+        logging.warning("Préchauffage de la base de données impossible : %s", e)
+
+
+def start_warmup():
+    # Préchauffage en arrière-plan au démarrage de l'instance, sur demande
+    # (DATABASE_WARMUP=1, Firestore seulement) : il charge le SDK et les
+    # identifiants à chaque démarrage à froid, ce que le chargement différé évite.
+    # Utile sur un serveur durable, pas sur des instances serverless éphémères.
+    if STORAGE_BACKEND != 'firestore' or os.getenv('DATABASE_WARMUP', '0') != '1':
+        return None
+    thread = threading.Thread(target=warm_database, name='prechauffage', daemon=True)
+    thread.start()
+    return thread
+
+
+class LazyDatabase:
+    # Se comporte comme le client renvoyé par get_database(), créé à la demande
+    def __getattr__(self, name):
+        return getattr(get_database(), name)
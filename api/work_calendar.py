@@ -0,0 +1,145 @@
+# api/work_calendar.py
+
+import os
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+from api.batching import BatchWriter
+
+# Champs calendaires écrits sur chaque période, en plus de date_debut et
+# date_fin (texte jj/mm/aaaa, affichés tels quels) :
+#   debut, fin : dates natives (minuit UTC), pour les requêtes par plage
+#   jours      : jours ouvrés de la période (jj/mm/aaaa), une ligne chacun sur la feuille
+DEBUT_FIELD = 'debut'
+FIN_FIELD = 'fin'
+JOURS_FIELD = 'jours'
+
+DATE_FORMAT = '%d/%m/%Y'
+HOURS_PER_DAY = 7
+
+
+def _parse_holiday_list(value):
+    return frozenset(date.fromisoformat(item.strip()) for item in value.split(',') if item.strip())
+
+
+# Jours fériés à ajouter au calendrier de La Réunion ou à en retirer (journée
+# de solidarité travaillée, pont accordé...) : dates AAAA-MM-JJ séparées par des virgules
+PUBLIC_HOLIDAYS_ADD = _parse_holiday_list(os.getenv('PUBLIC_HOLIDAYS_ADD', ''))
+PUBLIC_HOLIDAYS_REMOVE = _parse_holiday_list(os.getenv('PUBLIC_HOLIDAYS_REMOVE', ''))
+
+# Jours fériés à date fixe : ceux de la métropole et le 20 décembre (abolition de l'esclavage)
+FIXED_HOLIDAYS = ((1, 1), (5, 1), (5, 8), (7, 14), (8, 15), (11, 1), (11, 11), (12, 20), (12, 25))
+
+
+def _easter(year):
+    # Dimanche de Pâques (calendrier grégorien, algorithme de Meeus)
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+@lru_cache(maxsize=None)
+def public_holidays(year):
+    easter = _easter(year)
+    holidays = {date(year, month, day) for month, day in FIXED_HOLIDAYS}
+    # Lundi de Pâques, Ascension, lundi de Pentecôte
+    holidays.update(easter + timedelta(days=offset) for offset in (1, 39, 50))
+    holidays.update(day for day in PUBLIC_HOLIDAYS_ADD if day.year == year)
+    return frozenset(holidays - PUBLIC_HOLIDAYS_REMOVE)
+
+
+def is_working_day(day):
+    return day.weekday() < 5 and day not in public_holidays(day.year)
+
+
+@lru_cache(maxsize=1024)
+def working_days(debut, fin):
+    # Jours ouvrés de debut à fin inclus (dates), hors week-ends et jours fériés
+    return tuple(day for day in (debut + timedelta(days=n) for n in range((fin - debut).days + 1))
+                 if is_working_day(day))
+
+
+def as_datetime(day):
+    # Firestore ne stocke pas de date seule : minuit UTC du jour
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def as_date(value):
+    # Date d'un champ natif (datetime Firestore) ou d'un texte jj/mm/aaaa ;
+    # None si la valeur est absente ou mal formée
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def periode_fields(debut, fin):
+    # Champs d'une nouvelle période : dates affichées, dates natives, jours
+    # ouvrés et heures à effectuer (HOURS_PER_DAY par jour ouvré)
+    jours = working_days(debut, fin)
+    return {
+        'date_debut': debut.strftime(DATE_FORMAT),
+        'date_fin': fin.strftime(DATE_FORMAT),
+        DEBUT_FIELD: as_datetime(debut),
+        FIN_FIELD: as_datetime(fin),
+        JOURS_FIELD: [day.strftime(DATE_FORMAT) for day in jours],
+        'heures': len(jours) * HOURS_PER_DAY,
+    }
+
+
+def periode_bounds(periode):
+    # (début, fin) d'une période : champs natifs, ou à défaut (période antérieure
+    # au calendrier) son texte ; lève ValueError si une date est mal formée
+    bounds = []
+    for native, text in ((DEBUT_FIELD, 'date_debut'), (FIN_FIELD, 'date_fin')):
+        day = as_date(periode.get(native))
+        if day is None:
+            day = datetime.strptime(periode.get(text, '01/01/1970'), DATE_FORMAT).date()
+        bounds.append(day)
+    return tuple(bounds)
+
+
+def periode_days(periode):
+    # Jours ouvrés d'une période (jj/mm/aaaa), calculés seulement si la période
+    # n'a pas encore son calendrier
+    jours = periode.get(JOURS_FIELD)
+    if jours is not None:
+        return tuple(jours)
+    return tuple(day.strftime(DATE_FORMAT) for day in working_days(*periode_bounds(periode)))
+
+
+def backfill_periode_calendar(db, force=False, recompute_hours=False):
+    # Renseigne les champs calendaires des périodes qui ne les ont pas (toutes si
+    # force) ; leurs heures ne sont recalculées qu'avec recompute_hours.
+    # Renvoie (périodes parcourues, identifiants des sessions modifiées).
+    seen = 0
+    sessions = set()
+    with BatchWriter(db) as batch:
+        for doc in db.collection('periodes').stream():
+            seen += 1
+            data = doc.to_dict()
+            if not force and JOURS_FIELD in data:
+                continue
+            try:
+                debut, fin = periode_bounds(data)
+            except ValueError:
+                continue
+            fields = periode_fields(debut, fin)
+            if not recompute_hours:
+                del fields['heures']
+            batch.update(doc.reference, fields)
+            if data.get('session_id'):
+                sessions.add(data['session_id'])
+    return seen, sessions
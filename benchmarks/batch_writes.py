@@ -0,0 +1,59 @@
+# benchmarks/batch_writes.py
+
+# Compare la création d'une session document par document (ancien
+# create_session) et en lots via BatchWriter, avec une latence réseau simulée.
+#
+#   python -m benchmarks.batch_writes --candidates 30 --periods 4 --latency 0.03
+
+import argparse
+import time
+
+from google.cloud import firestore
+
+from api.batching import BatchWriter
+from benchmarks.fake_firestore import FakeClient
+
+
+def _documents(candidates, periods):
+    docs = [('candidats', {'nom': f"Nom{i}", 'prenom': f"Prenom{i}"}) for i in range(candidates)]
+    docs += [('periodes', {'date_debut': '01/01/2024', 'date_fin': '05/01/2024', 'heures': 35})
+             for _ in range(periods)]
+    return docs
+
+
+def sequential(db, docs):
+    session_ref = db.collection('sessions').document()
+    session_ref.set({'created_at': firestore.SERVER_TIMESTAMP})
+    for collection, data in docs:
+        db.collection(collection).add(dict(data, session_id=session_ref.id))
+
+
+def batched(db, docs):
+    with BatchWriter(db) as batch:
+        session_ref = batch.add('sessions', {'created_at': firestore.SERVER_TIMESTAMP})
+        for collection, data in docs:
+            batch.add(collection, dict(data, session_id=session_ref.id))
+
+
+def measure(strategy, docs, latency):
+    db = FakeClient(latency=latency)
+    start = time.perf_counter()
+    strategy(db, docs)
+    return (time.perf_counter() - start) * 1000, db.stats.get('round_trips', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Écritures séquentielles contre écritures en lots.")
+    parser.add_argument('--candidates', type=int, default=30)
+    parser.add_argument('--periods', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.03, help="latence simulée par appel (s)")
+    args = parser.parse_args()
+
+    docs = _documents(args.candidates, args.periods)
+    for name, strategy in (('séquentiel', sequential), ('par lots', batched)):
+        elapsed, round_trips = measure(strategy, docs, args.latency)
+        print(f"{name:<11} {len(docs) + 1} documents  {round_trips:>3} allers-retours  {elapsed:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# benchmarks/fake_firestore.py
+
+# Substitut en mémoire de google.cloud.firestore.Client, limité aux appels
+# utilisés par l'application. Permet de mesurer les routes sans projet Firebase.
+
+import copy
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.transforms import Sentinel, Increment
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, fields=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self._fields = fields
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        data = copy.deepcopy(self._data)
+        if self._fields is not None:
+            data = {k: v for k, v in data.items() if k in self._fields}
+        return data
+
+    def get(self, field):
+        return self._data[field]
+
+
+class FakeDocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def get(self, transaction=None, field_paths=None):
+        self._client._round_trip('reads')
+        return self._snapshot(field_paths)
+
+    def _snapshot(self, field_paths=None):
+        data = self._client._store.get(self._collection, {}).get(self.id)
+        return FakeSnapshot(self, data, field_paths)
+
+    def set(self, data, merge=False):
+        self._client._round_trip('writes')
+        self._client._apply_set(self, data, merge)
+
+    def update(self, data):
+        self._client._round_trip('writes')
+        self._client._apply_update(self, data)
+
+    def delete(self):
+        self._client._round_trip('writes')
+        self._client._apply_delete(self)
+
+
+def _compare(current, op, value):
+    # Comme Firestore, une comparaison entre types différents (None compris) ne correspond pas
+    try:
+        return {'<': current < value, '<=': current <= value,
+                '>': current > value, '>=': current >= value}[op]
+    except TypeError:
+        return False
+
+
+class FakeQuery:
+    def __init__(self, client, collection, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                     cursor=self._cursor, fields=self._fields)
+        state.update(changes)
+        return FakeQuery(self._client, self._collection, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=firestore.Query.ASCENDING):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, values):
+        return self._copy(cursor=values)
+
+    def select(self, field_paths):
+        return self._copy(fields=tuple(field_paths))
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            # Chemin pointé ('resume.fin') : champ d'une map imbriquée
+            current = data
+            for part in field.split('.'):
+                if not isinstance(current, dict) or part not in current:
+                    return False
+                current = current[part]
+            if op == '==' and not current == value:
+                return False
+            if op == '!=' and not current != value:
+                return False
+            if op in ('<', '<=', '>', '>=') and not _compare(current, op, value):
+                return False
+            if op == 'in' and current not in value:
+                return False
+            if op == 'array_contains' and value not in current:
+                return False
+        return True
+
+    def _sort_key(self, field, data):
+        value = data.get(field)
+        return (value is not None, value)
+
+    def _run(self):
+        docs = self._client._store.get(self._collection, {})
+        # Le tri par identifiant reproduit le départage implicite sur __name__
+        rows = sorted((doc_id, data) for doc_id, data in docs.items() if self._matches(data))
+        for field, direction in reversed(self._orders):
+            rows.sort(key=lambda row: self._sort_key(field, row[1]),
+                      reverse=direction == firestore.Query.DESCENDING)
+        if self._cursor is not None:
+            rows = self._after_cursor(rows)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    def _after_cursor(self, rows):
+        if isinstance(self._cursor, FakeSnapshot):
+            for index, (doc_id, _) in enumerate(rows):
+                if doc_id == self._cursor.id:
+                    return rows[index + 1:]
+            return rows
+        cursor = tuple(self._cursor.get(field) for field, _ in self._orders)
+        for index, (_, data) in enumerate(rows):
+            values = tuple(data.get(field) for field, _ in self._orders)
+            if values == cursor:
+                return rows[index + 1:]
+        return rows
+
+    def stream(self, transaction=None):
+        self._client._round_trip('queries')
+        rows = self._run()
+        self._client._count('documents', len(rows))
+        for doc_id, data in rows:
+            reference = FakeDocumentReference(self._client, self._collection, doc_id)
+            yield FakeSnapshot(reference, data, self._fields)
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self._client, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        reference = self.document()
+        reference.set(data)
+        return None, reference
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, data, merge=False):
+        self._ops.append(('set', reference, data, merge))
+
+    def update(self, reference, data):
+        self._ops.append(('update', reference, data, None))
+
+    def delete(self, reference):
+        self._ops.append(('delete', reference, None, None))
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise ValueError("Un lot Firestore est limité à 500 écritures.")
+        self._client._round_trip('writes')
+        with self._client._lock:
+            for op, reference, data, merge in self._ops:
+                if op == 'set':
+                    self._client._apply_set(reference, data, merge)
+                elif op == 'update':
+                    self._client._apply_update(reference, data)
+                else:
+                    self._client._apply_delete(reference)
+        ops, self._ops = self._ops, []
+        return ops
+
+
+class FakeTransaction(FakeWriteBatch):
+    # Interface attendue par firestore.transactional ; les transactions sont
+    # sérialisées par un verrou global, ce qui suffit à garantir l'atomicité.
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._id = None
+
+    def _clean_up(self):
+        self._ops = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._client._tx_lock.acquire()
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        try:
+            if self._ops:
+                self.commit()
+        finally:
+            self._clean_up()
+            self._client._tx_lock.release()
+
+    def _rollback(self):
+        if self._id is not None:
+            self._clean_up()
+            self._client._tx_lock.release()
+
+
+class FakeClient:
+    def __init__(self, latency=0.0):
+        # latency : délai simulé (en secondes) pour chaque aller-retour réseau
+        self.latency = latency
+        self.stats = {}
+        self._store = {}
+        self._lock = threading.RLock()
+        self._tx_lock = threading.RLock()
+
+    def _count(self, kind, amount=1):
+        with self._lock:
+            self.stats[kind] = self.stats.get(kind, 0) + amount
+
+    def _round_trip(self, kind):
+        self._count(kind)
+        self._count('round_trips')
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {}
+
+    def _resolve(self, current, data):
+        resolved = dict(current or {})
+        for key, value in data.items():
+            if isinstance(value, Sentinel) and value is firestore.SERVER_TIMESTAMP:
+                value = datetime.now(timezone.utc)
+            elif isinstance(value, Increment):
+                value = (resolved.get(key) or 0) + value.value
+            resolved[key] = copy.deepcopy(value)
+        return resolved
+
+    def _apply_set(self, reference, data, merge):
+        with self._lock:
+            docs = self._store.setdefault(reference._collection, {})
+            current = docs.get(reference.id) if merge else None
+            docs[reference.id] = self._resolve(current, data)
+
+    def _apply_update(self, reference, data):
+        with self._lock:
+            docs = self._store.setdefault(reference._collection, {})
+            if reference.id not in docs:
+                raise KeyError(f"Document introuvable : {reference.path}")
+            docs[reference.id] = self._resolve(docs[reference.id], data)
+
+    def _apply_delete(self, reference):
+        with self._lock:
+            self._store.get(reference._collection, {}).pop(reference.id, None)
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return FakeTransaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        self._round_trip('reads')
+        for reference in references:
+            yield reference._snapshot(field_paths)
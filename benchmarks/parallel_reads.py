@@ -0,0 +1,105 @@
+# benchmarks/parallel_reads.py
+
+# Lectures indépendantes lancées l'une après l'autre (--workers 1) ou en même
+# temps (api/parallel_reads.py) sur les routes qui en font plusieurs :
+# session_details sur des sessions sans champs dénormalisés, generate_attendance
+# avec signatures, delete_session. Firestore en mémoire avec latence simulée.
+#
+#   python -m benchmarks.parallel_reads --latency 0.02 --workers 1 8
+
+import argparse
+import random
+
+from benchmarks.routes import _run, app_module
+from api import parallel_reads
+from api.pdf_cache import pdf_store
+from api.session_cache import session_cache
+from api.session_summary import CANDIDATS_FIELD, PERIODES_FIELD, SUMMARY_FIELD
+from api.signatures import SLOTS, save_signatures
+from api.storage import get_database, set_database
+from benchmarks.fake_firestore import FakeClient
+from benchmarks.synthetic import seed
+
+
+def _strokes(rng):
+    # Signature de deux tracés de quarante points
+    return [[coordinate for i in range(40) for coordinate in (100 + 10 * i + rng.randrange(5), 150 + rng.randrange(100))]
+            for _ in range(2)]
+
+
+def seed_signatures(db, session_ids, rng):
+    # Premier jour de chaque période signé par tous les candidats, matin et après-midi
+    for session_id in session_ids:
+        aggregate = session_cache.get(db, session_id)
+        items = [{'p': periode['id'], 'c': candidat['id'], 'j': periode['jours'][0], 's': slot, 't': _strokes(rng)}
+                 for periode in aggregate['periodes'] for candidat in aggregate['candidats'] for slot in SLOTS]
+        for start in range(0, len(items), 500):
+            save_signatures(db, session_id, aggregate, items[start:start + 500])
+
+
+def strip_summaries(fake):
+    # Sessions antérieures aux champs dénormalisés : candidats et périodes lus
+    # dans leurs collections
+    for data in fake._store['sessions'].values():
+        for field in (SUMMARY_FIELD, CANDIDATS_FIELD, PERIODES_FIELD):
+            data.pop(field, None)
+
+
+def run_mode(db, client, session_ids, doomed, iterations, rng):
+    results = {}
+    results['session_details'] = _run('session_details', db, iterations,
+                                      lambda i: client.get(f"/session/{rng.choice(session_ids)}"))
+
+    def generate(i):
+        session_id = rng.choice(session_ids)
+        pdf_store.invalidate_session(session_id)
+        return client.post('/generate_attendance', follow_redirects=True, data={
+            'session_id': session_id, 'all_candidates': '1', 'all_periodes': '1', 'signatures': '1'})
+    results['generate_attendance'] = _run('generate_attendance', db, iterations, generate)
+
+    results['delete_session'] = _run('delete_session', db, len(doomed),
+                                     lambda i: client.post(f"/delete_session/{doomed[i]}"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lectures séquentielles contre lectures simultanées.")
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--candidates', type=int, default=15)
+    parser.add_argument('--periods', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02, help="latence simulée par appel (s)")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, parallel_reads.READ_WORKERS])
+    args = parser.parse_args()
+
+    if args.iterations * len(args.workers) > args.sessions:
+        parser.error("--sessions doit couvrir une session supprimée par itération et par mode.")
+
+    # ReportLab chargé d'avance : seul l'accès aux données est comparé
+    import api.attendance_pdf  # noqa: F401
+
+    fake = FakeClient()
+    set_database(fake)
+    db = get_database()
+    session_ids = seed(db, args.sessions, args.candidates, args.periods)
+    rng = random.Random(0)
+    seed_signatures(db, session_ids, rng)
+    strip_summaries(fake)
+    fake.latency = args.latency
+    client = app_module.app.test_client()
+
+    print(f"{args.sessions} sessions x {args.candidates} candidats x {args.periods} périodes, "
+          f"latence {args.latency * 1000:.0f} ms\n")
+    print(f"{'route':<21} {'lectures':>8} {'p50 ms':>9} {'p99 ms':>9} {'allers-retours':>15}")
+    for index, workers in enumerate(args.workers):
+        parallel_reads.configure(workers)
+        doomed = session_ids[index * args.iterations:(index + 1) * args.iterations]
+        remaining = session_ids[len(args.workers) * args.iterations:]
+        results = run_mode(db, client, remaining, doomed, args.iterations, random.Random(1))
+        for name, result in results.items():
+            print(f"{name:<21} {workers:8d} {result['p50_ms']:9.1f} {result['p99_ms']:9.1f} "
+                  f"{result['round_trips']:15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/pdf_streaming.py
+
+# Mesure, pour 10/100/1000 pages, le temps de génération, le temps jusqu'au
+# premier bloc envoyé, le pic mémoire Python et la mémoire retenue pendant le
+# téléchargement, en mode tampon mémoire et en mode fichier temporaire.
+#
+#   python -m benchmarks.pdf_streaming --pages 10 100 1000
+
+import argparse
+import time
+import tracemalloc
+
+import api.attendance_pdf as attendance_pdf
+
+SESSION = {'session_number': 42, 'formation': 'TP CTRMP', 'site': 'Saint-Pierre'}
+PERIODE = {'date_debut': '02/09/2024', 'date_fin': '13/09/2024', 'heures': 84}
+BLOCK_SIZE = 8192
+
+
+def _export(candidats, trace):
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    output = attendance_pdf.build_attendance_pdf(SESSION, [PERIODE], candidats)
+    first_block = output.read(BLOCK_SIZE)
+    ttfb = time.perf_counter() - start
+    # Mémoire encore allouée alors que le client télécharge le fichier
+    retained, peak = tracemalloc.get_traced_memory() if trace else (0, 0)
+    size = len(first_block)
+    while True:
+        block = output.read(BLOCK_SIZE)
+        if not block:
+            break
+        size += len(block)
+    total = time.perf_counter() - start
+    if trace:
+        tracemalloc.stop()
+    output.close()
+    return ttfb, total, peak, retained, size
+
+
+def measure(pages, threshold):
+    attendance_pdf.PDF_STREAMING_THRESHOLD = threshold
+    candidats = [{'nom': f"Nom{i}", 'prenom': f"Prenom{i}"} for i in range(pages)]
+    # Les temps sont mesurés sans tracemalloc, qui ralentit fortement ReportLab
+    ttfb, total, _, _, size = _export(candidats, trace=False)
+    _, _, peak, retained, _ = _export(candidats, trace=True)
+    return ttfb, total, peak, retained, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export PDF en mémoire contre export en flux.")
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    for pages in args.pages:
+        # Seuil à l'infini : tampon mémoire ; seuil à 0 : fichier temporaire
+        for mode, threshold in (('mémoire', float('inf')), ('fichier', 0)):
+            ttfb, total, peak, retained, size = measure(pages, threshold)
+            print(f"{pages:>5} pages  {mode:<8} 1er bloc={ttfb * 1000:8.1f} ms  total={total * 1000:8.1f} ms  "
+                  f"pic={peak / 1e6:6.1f} Mo  retenu={retained / 1e6:6.2f} Mo  taille={size / 1e3:8.1f} Ko")
+
+
+if __name__ == "__main__":
+    main()
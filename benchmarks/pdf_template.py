@@ -0,0 +1,64 @@
+# benchmarks/pdf_template.py
+
+# Compare l'ancien rendu (tableau reconstruit et éléments fixes redessinés à
+# chaque page) avec le modèle de page partagé (Form XObject par période).
+#
+#   python -m benchmarks.pdf_template --candidates 30 --periods 6
+
+import argparse
+import io
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from api import attendance_pdf
+from api.work_calendar import periode_days
+
+SESSION = {'session_number': 42, 'formation': 'TP CTRMP', 'site': 'Saint-Pierre'}
+
+
+def _periodes(count):
+    return [{'date_debut': f"{day:02d}/09/2024", 'date_fin': f"{day + 11:02d}/09/2024", 'heures': 84}
+            for day in range(1, count + 1)]
+
+
+def render_direct(periodes, candidats):
+    p = canvas.Canvas(io.BytesIO(), pagesize=A4)
+    for periode in periodes:
+        jours = periode_days(periode)
+        for candidat in candidats:
+            # Comme avant : tableau reconstruit à chaque page
+            attendance_pdf.draw_attendance_page(p, SESSION, periode, candidat, jours)
+    p.save()
+
+
+def render_template(periodes, candidats):
+    attendance_pdf.render_attendance_pdf(io.BytesIO(), SESSION, periodes, candidats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendu page par page contre modèle de page partagé.")
+    parser.add_argument('--candidates', type=int, default=30)
+    parser.add_argument('--periods', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    periodes = _periodes(args.periods)
+    candidats = [{'nom': f"Nom{i}", 'prenom': f"Prenom{i}"} for i in range(args.candidates)]
+    pages = len(periodes) * len(candidats)
+
+    results = {}
+    for name, render in (('direct', render_direct), ('modèle', render_template)):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            render(periodes, candidats)
+            timings.append(time.perf_counter() - start)
+        results[name] = min(timings)
+        print(f"{name:<7} {pages} pages  {results[name] * 1000:8.1f} ms  ({results[name] * 1e6 / pages:7.1f} µs/page)")
+    print(f"accélération : x{results['direct'] / results['modèle']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# benchmarks/routes.py
+
+# Mesure les routes principales de l'application (create_session,
+# list_sessions, session_details, delete_session, generate_attendance) contre
+# le substitut en mémoire de Firestore, avec une latence simulée par appel et
+# un jeu de données synthétique.
+#
+#   python -m benchmarks.routes --sessions 200 --candidates 25 --periods 4 --latency 0.02
+#   python -m benchmarks.routes --save benchmarks/routes_baseline.json
+#   python -m benchmarks.routes --compare benchmarks/routes_baseline.json
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('PDF_CACHE_DIR', tempfile.mkdtemp(prefix='emargement_bench_'))
+
+import api.app as app_module
+from api.pdf_cache import pdf_store
+from api.session_cache import session_cache
+from api.storage import get_database, set_database
+from benchmarks.fake_firestore import FakeClient
+from benchmarks.synthetic import seed, session_form
+
+# Écart relatif toléré avant de signaler une régression avec --compare
+DEFAULT_TOLERANCE = 0.2
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _run(name, db, iterations, call):
+    # call(i) exécute la i-ème requête et renvoie la réponse ; les caches sont
+    # vidés avant chaque appel pour mesurer le chemin complet
+    timings = []
+    db.reset_stats()
+    for i in range(iterations):
+        session_cache.clear()
+        start = time.perf_counter()
+        response = call(i)
+        timings.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} : statut {response.status_code}")
+    round_trips = db.stats.get('round_trips', 0)
+    return {
+        'iterations': iterations,
+        'throughput': iterations / sum(timings),
+        'p50_ms': _percentile(timings, 0.5) * 1000,
+        'p99_ms': _percentile(timings, 0.99) * 1000,
+        'round_trips': round_trips / iterations,
+    }
+
+
+def run_suite(sessions, candidates, periods, latency, iterations, seed_value=0):
+    # ReportLab chargé d'avance : le démarrage à froid est mesuré par benchmarks.startup
+    import api.attendance_pdf  # noqa: F401
+
+    # Le jeu de données est écrit par lots : quelques allers-retours seulement
+    set_database(FakeClient(latency=latency))
+    db = get_database()
+    session_ids = seed(db, sessions, candidates, periods, seed_value)
+    client = app_module.app.test_client()
+    rng = random.Random(seed_value)
+    results = {}
+
+    form = session_form(rng, candidates, periods)
+    results['create_session'] = _run('create_session', db, iterations,
+                                     lambda i: client.post('/create_session', data=form))
+
+    results['list_sessions'] = _run('list_sessions', db, iterations,
+                                    lambda i: client.get('/sessions'))
+
+    results['session_details'] = _run('session_details', db, iterations,
+                                      lambda i: client.get(f"/session/{rng.choice(session_ids)}"))
+
+    def generate(i):
+        # Feuille de toute la session, sans reprendre un PDF déjà en cache
+        session_id = rng.choice(session_ids)
+        pdf_store.invalidate_session(session_id)
+        return client.post('/generate_attendance', follow_redirects=True, data={
+            'session_id': session_id, 'all_candidates': '1', 'all_periodes': '1'})
+    results['generate_attendance'] = _run('generate_attendance', db, iterations, generate)
+
+    # Suppression des sessions les plus anciennes, une par itération
+    doomed = session_ids[:iterations]
+    results['delete_session'] = _run('delete_session', db, len(doomed),
+                                     lambda i: client.post(f"/delete_session/{doomed[i]}"))
+
+    results['pdf_render'] = measure_pdf(candidates, periods, iterations)
+    return results
+
+
+def measure_pdf(candidates, periods, iterations):
+    # Rendu seul, sans Firestore ni Flask
+    from api.attendance_pdf import build_attendance_pdf
+
+    rng = random.Random(1)
+    form = session_form(rng, candidates, periods)
+    session_data = {'session_number': 1, 'formation': form['formation'], 'site': form['site']}
+    candidats = [{'nom': nom, 'prenom': prenom} for nom, prenom in zip(form['nom'], form['prenom'])]
+    periodes = [{'date_debut': '/'.join(reversed(debut.split('-'))), 'date_fin': '/'.join(reversed(fin.split('-'))),
+                 'heures': 84} for debut, fin in zip(form['date_debut'], form['date_fin'])]
+    timings = []
+    size = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        with build_attendance_pdf(session_data, periodes, candidats) as pdf_file:
+            size = len(pdf_file.read())
+        timings.append(time.perf_counter() - start)
+    pages = len(periodes) * len(candidats)
+    return {
+        'iterations': iterations,
+        'pages': pages,
+        'bytes': size,
+        'p50_ms': _percentile(timings, 0.5) * 1000,
+        'p99_ms': _percentile(timings, 0.99) * 1000,
+        'us_per_page': _percentile(timings, 0.5) * 1e6 / pages,
+    }
+
+
+def print_results(results):
+    print(f"{'route':<21} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'allers-retours':>15}")
+    for name, result in results.items():
+        if name == 'pdf_render':
+            continue
+        print(f"{name:<21} {result['throughput']:8.1f} {result['p50_ms']:9.1f} {result['p99_ms']:9.1f} "
+              f"{result['round_trips']:15.1f}")
+    pdf = results['pdf_render']
+    print(f"\nrendu PDF : {pdf['pages']} pages, {pdf['bytes']} octets, p50 {pdf['p50_ms']:.1f} ms, "
+          f"p99 {pdf['p99_ms']:.1f} ms ({pdf['us_per_page']:.0f} µs/page)")
+
+
+def compare(results, baseline, tolerance):
+    # Régressions : latence médiane ou nombre d'allers-retours en hausse au-delà de la tolérance
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in ('p50_ms', 'round_trips'):
+            if metric in result and metric in reference and reference[metric] > 0:
+                change = result[metric] / reference[metric] - 1
+                if change > tolerance:
+                    regressions.append(f"{name} {metric} : {reference[metric]:.1f} -> {result[metric]:.1f} "
+                                       f"(+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routes de l'application contre un Firestore en mémoire.")
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--candidates', type=int, default=25)
+    parser.add_argument('--periods', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02, help="latence simulée par appel (s)")
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help="enregistrer les résultats (JSON)")
+    parser.add_argument('--compare', help="comparer à des résultats enregistrés")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    if args.iterations > args.sessions:
+        parser.error("--iterations ne peut pas dépasser --sessions (une session supprimée par itération).")
+
+    results = run_suite(args.sessions, args.candidates, args.periods, args.latency, args.iterations, args.seed)
+    print(f"{args.sessions} sessions x {args.candidates} candidats x {args.periods} périodes, "
+          f"latence {args.latency * 1000:.0f} ms\n")
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump({'parameters': vars(args), 'results': results}, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRégressions :")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nAucune régression par rapport à la référence.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/startup.py
+
+# Mesure le démarrage à froid de l'application : temps d'import des modules
+# (python -X importtime), durée totale jusqu'à la première réponse, et modules
+# lourds chargés ou non avant la première requête.
+#
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --record   # ajoute la mesure à startup_history.csv
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_history.csv')
+
+# Modules dont le chargement doit rester différé jusqu'au premier usage
+HEAVY_MODULES = ('google.cloud.firestore', 'firebase_admin', 'reportlab')
+
+# Exécuté dans un processus neuf : import de l'application puis une requête sur '/'
+CHILD_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import api.app
+imported = time.perf_counter()
+api.app.app.test_client().get('/')
+served = time.perf_counter()
+print('IMPORT', imported - start)
+print('FIRST_REQUEST', served - start)
+for name in sys.argv[1:]:
+    print('LOADED', name, name in sys.modules)
+"""
+
+
+def run_once():
+    env = dict(os.environ)
+    env.setdefault('SECRET_KEY', 'benchmark')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, *HEAVY_MODULES],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+    # Lignes "import time: self | cumulative | module" écrites sur stderr
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports[module.strip()] = int(cumulative) / 1000
+
+    timings = {}
+    loaded = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if parts[0] in ('IMPORT', 'FIRST_REQUEST'):
+            timings[parts[0]] = float(parts[1]) * 1000
+        elif parts[0] == 'LOADED':
+            loaded[parts[1]] = parts[2] == 'True'
+    return imports, timings, loaded
+
+
+def _commit():
+    # Commit mesuré ; suffixe -dirty si l'arbre contient des modifications non
+    # validées (la mesure ne correspond alors pas exactement au commit)
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def record(timings):
+    new_file = not os.path.exists(HISTORY_PATH)
+    with open(HISTORY_PATH, 'a', newline='') as history:
+        writer = csv.writer(history)
+        if new_file:
+            writer.writerow(['date', 'commit', 'python', 'import_ms', 'first_request_ms'])
+        writer.writerow([datetime.now().strftime('%Y-%m-%d %H:%M'), _commit(),
+                         sys.version.split()[0], f"{timings['IMPORT']:.1f}", f"{timings['FIRST_REQUEST']:.1f}"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de démarrage à froid de l'application.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="nombre de modules les plus coûteux affichés")
+    parser.add_argument('--record', action='store_true', help="ajouter la mesure à startup_history.csv")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeat)]
+    # Meilleure exécution : la moins perturbée par le reste de la machine
+    imports, timings, loaded = min(runs, key=lambda run: run[1]['FIRST_REQUEST'])
+
+    print(f"import api.app      {timings['IMPORT']:8.1f} ms")
+    print(f"première requête    {timings['FIRST_REQUEST']:8.1f} ms")
+    print()
+    print("modules les plus coûteux (cumulé) :")
+    top_level = {name: ms for name, ms in imports.items() if '.' not in name or name.startswith('api.')}
+    for name, ms in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<40} {ms:8.1f} ms")
+    print()
+    for name in HEAVY_MODULES:
+        print(f"{name:<24} {'chargé' if loaded.get(name) else 'différé'}")
+
+    if args.record:
+        record(timings)
+        print(f"\nMesure ajoutée à {os.path.relpath(HISTORY_PATH, ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/synthetic.py
+
+# Jeu de données synthétique : N sessions de M candidats et P périodes, écrit
+# avec la même forme de documents que create_session (résumé dénormalisé et
+# calendrier des périodes compris) dans n'importe quel client à l'API Firestore.
+
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from api.batching import BatchWriter
+from api.candidate_search import with_search_tokens
+from api.counters import session_counter_ref
+from api.session_summary import candidat_entry, periode_entry, summary_fields
+from api.work_calendar import periode_fields
+
+NOMS = ["Payet", "Hoarau", "Grondin", "Fontaine", "Boyer", "Técher", "Robert", "Maillot",
+        "Rivière", "Nativel", "Lebon", "Dijoux", "Turpin", "Morel", "Hoareau", "Sautron"]
+PRENOMS = ["Jean", "Marie", "Kévin", "Léa", "Mathis", "Chloé", "Dylan", "Inès",
+           "Noah", "Emma", "Lucas", "Jade", "Enzo", "Manon", "Yanis", "Océane"]
+SITES = ["Saint-Pierre", "Saint-André"]
+FORMATIONS = ["TP CTRMP", "TP CLVUL", "TP CTRMTV", "TP CTCR"]
+
+
+def session_form(rng, candidates, periods, start=date(2024, 1, 8)):
+    # Champs du formulaire de create_session
+    form = {
+        'site': rng.choice(SITES),
+        'formation': rng.choice(FORMATIONS),
+        'nom': [f"{rng.choice(NOMS)}{i}" for i in range(candidates)],
+        'prenom': [rng.choice(PRENOMS) for _ in range(candidates)],
+        'date_debut': [],
+        'date_fin': [],
+    }
+    for i in range(periods):
+        debut = start + timedelta(weeks=3 * i)
+        form['date_debut'].append(debut.isoformat())
+        form['date_fin'].append((debut + timedelta(days=11)).isoformat())
+    return form
+
+
+def seed(db, sessions, candidates, periods, seed_value=0):
+    # Écrit les sessions et renvoie leurs identifiants, dans l'ordre des numéros
+    rng = random.Random(seed_value)
+    session_ids = []
+    with BatchWriter(db) as batch:
+        for number in range(1, sessions + 1):
+            form = session_form(rng, candidates, periods, start=date(2024, 1, 8) + timedelta(days=rng.randrange(300)))
+            session_ref = db.collection('sessions').document()
+            candidats = []
+            for nom, prenom in zip(form['nom'], form['prenom']):
+                data = {'nom': nom, 'prenom': prenom, 'session_id': session_ref.id}
+                candidats.append(candidat_entry(batch.add('candidats', with_search_tokens(data)).id, data))
+            periodes = []
+            for debut, fin in zip(form['date_debut'], form['date_fin']):
+                data = {
+                    **periode_fields(date.fromisoformat(debut), date.fromisoformat(fin)),
+                    'session_id': session_ref.id,
+                }
+                periodes.append(periode_entry(batch.add('periodes', data).id, data))
+            batch.set(session_ref, {
+                'session_number': number,
+                'site': form['site'],
+                'formation': form['formation'],
+                'annule': False,
+                'created_at': datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=number),
+                **summary_fields(candidats, periodes),
+            })
+            session_ids.append(session_ref.id)
+        batch.set(session_counter_ref(db), {'current': sessions})
+    return session_ids
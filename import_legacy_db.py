@@ -0,0 +1,78 @@
+# import_legacy_db.py
+
+# Importe les tables session/candidate/periode de l'ancienne base SQLAlchemy
+# (emargement.db) dans le moteur de stockage configuré (STORAGE_BACKEND).
+#
+#   STORAGE_BACKEND=sqlite python import_legacy_db.py emargement.db
+
+import sqlite3
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+from google.cloud import firestore
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+from api.batching import BatchWriter
+from api.candidate_search import with_search_tokens
+from api.counters import reconcile_session_counter
+from api.session_summary import backfill_session_summaries
+from api.storage import create_database
+from api.work_calendar import periode_fields
+
+
+def import_legacy_database(db, legacy_path):
+    legacy = sqlite3.connect(legacy_path)
+    counts = {'sessions': 0, 'candidats': 0, 'periodes': 0}
+
+    with BatchWriter(db) as batch:
+        # L'identifiant historique sert de numéro de session et d'identifiant de document
+        for session_id, code_session, site, formation, annule in legacy.execute(
+                "SELECT id, code_session, site, formation, annule FROM session ORDER BY id"):
+            batch.set(db.collection('sessions').document(f"legacy-{session_id}"), {
+                'session_number': session_id,
+                'code_session': code_session,
+                'site': site,
+                'formation': formation,
+                'annule': bool(annule),
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
+            counts['sessions'] += 1
+
+        for candidate_id, nom, prenom, session_id in legacy.execute(
+                "SELECT id, nom, prenom, session_id FROM candidate ORDER BY id"):
+            batch.set(db.collection('candidats').document(f"legacy-{candidate_id}"), with_search_tokens({
+                'nom': nom,
+                'prenom': prenom,
+                'session_id': f"legacy-{session_id}",
+                'created_at': firestore.SERVER_TIMESTAMP
+            }))
+            counts['candidats'] += 1
+
+        for periode_id, date_debut, date_fin, heures, session_id in legacy.execute(
+                "SELECT id, date_debut, date_fin, heures, session_id FROM periode ORDER BY id"):
+            # Calendrier des jours ouvrés calculé à l'import ; les heures saisies sont conservées
+            batch.set(db.collection('periodes').document(f"legacy-{periode_id}"), {
+                **periode_fields(datetime.strptime(date_debut, '%Y-%m-%d').date(),
+                                 datetime.strptime(date_fin, '%Y-%m-%d').date()),
+                'heures': heures,
+                'session_id': f"legacy-{session_id}",
+                'created_at': firestore.SERVER_TIMESTAMP
+            })
+            counts['periodes'] += 1
+
+    legacy.close()
+    # Les prochaines sessions doivent être numérotées après les sessions importées
+    reconcile_session_counter(db)
+    # Résumés dénormalisés des sessions importées
+    backfill_session_summaries(db)
+    return counts
+
+
+if __name__ == "__main__":
+    legacy_path = sys.argv[1] if len(sys.argv) > 1 else 'emargement.db'
+    counts = import_legacy_database(create_database(), legacy_path)
+    print(f"Import terminé : {counts['sessions']} sessions, {counts['candidats']} candidats, "
+          f"{counts['periodes']} périodes.")
@@ -0,0 +1,26 @@
+# init_candidate_search.py
+
+# Renseigne sur chaque candidat l'index de recherche par nom et prénom
+# (préfixes normalisés, champ search_tokens). À lancer une fois après la mise à
+# jour, puis avec --force pour tout recalculer.
+#
+#   python init_candidate_search.py [--force]
+
+import sys
+
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+from api.candidate_search import backfill_search_tokens
+from api.storage import create_database
+
+
+def initialize_candidate_search(force=False):
+    seen, updated = backfill_search_tokens(create_database(), force=force)
+    print(f"{updated} candidat(s) mis à jour sur {seen}.")
+
+
+if __name__ == "__main__":
+    initialize_candidate_search(force='--force' in sys.argv[1:])
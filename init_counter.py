@@ -7,6 +7,8 @@ from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+from api.counters import reconcile_session_counter
+
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
@@ -23,15 +25,13 @@ firebase_admin.initialize_app(cred)
 db = firestore.client()
 
 def initialize_counter():
-    sessions_ref = db.collection('sessions')
-    counter_ref = db.collection('counters').document('sessions')
-
-    # Compter le nombre de sessions existantes
-    count = sum(1 for _ in sessions_ref.stream())
-
-    # Mettre à jour le compteur
-    counter_ref.set({'current': count}, merge=True)
-    print(f"Compteur initialisé à {count} sessions.")
+    # Aligner le compteur sur le plus grand numéro attribué (et non sur le nombre
+    # de sessions, qui diminue après une suppression)
+    previous, current = reconcile_session_counter(db)
+    if previous == current:
+        print(f"Compteur déjà cohérent : {current}.")
+    else:
+        print(f"Compteur corrigé : {previous} -> {current}.")
 
 if __name__ == "__main__":
     initialize_counter()
@@ -0,0 +1,34 @@
+# init_periode_calendar.py
+
+# Renseigne sur chaque période ses dates natives et ses jours ouvrés (hors
+# week-ends et jours fériés de La Réunion), puis recalcule le résumé des
+# sessions concernées. À lancer une fois après la mise à jour, puis avec
+# --force après un changement de PUBLIC_HOLIDAYS_ADD / PUBLIC_HOLIDAYS_REMOVE.
+# Les heures déjà enregistrées sont conservées, sauf avec --recompute-hours
+# (7 heures par jour ouvré).
+#
+#   python init_periode_calendar.py [--force] [--recompute-hours]
+
+import sys
+
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+from api.session_summary import refresh_session_summary
+from api.storage import create_database
+from api.work_calendar import backfill_periode_calendar
+
+
+def initialize_periode_calendar(force=False, recompute_hours=False):
+    db = create_database()
+    seen, sessions = backfill_periode_calendar(db, force=force, recompute_hours=recompute_hours)
+    for session_id in sorted(sessions):
+        refresh_session_summary(db, session_id)
+    print(f"{seen} période(s) parcourue(s), {len(sessions)} session(s) mise(s) à jour.")
+
+
+if __name__ == "__main__":
+    initialize_periode_calendar(force='--force' in sys.argv[1:],
+                                recompute_hours='--recompute-hours' in sys.argv[1:])
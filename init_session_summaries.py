@@ -0,0 +1,26 @@
+# init_session_summaries.py
+
+# Renseigne sur chaque session les champs dénormalisés (résumé, listes de
+# candidats et de périodes) utilisés par la liste et le détail des sessions.
+# À lancer une fois après la mise à jour, puis avec --force pour tout recalculer.
+#
+#   python init_session_summaries.py [--force]
+
+import sys
+
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement depuis .env
+load_dotenv()
+
+from api.session_summary import backfill_session_summaries
+from api.storage import create_database
+
+
+def initialize_session_summaries(force=False):
+    seen, updated = backfill_session_summaries(create_database(), force=force)
+    print(f"{updated} session(s) mise(s) à jour sur {seen}.")
+
+
+if __name__ == "__main__":
+    initialize_session_summaries(force='--force' in sys.argv[1:])